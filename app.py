@@ -1,159 +1,762 @@
 import os
-from fastapi import FastAPI, HTTPException, Query
-from sqlalchemy import create_engine, MetaData, text
+import json
+import asyncio
+import hashlib
+import contextvars
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List
 from datetime import datetime, timedelta
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from normalizacion import parsear_fecha, parsear_hora, bucket_media_hora, formatear_hora, ahora_venues
+from snapshot import Snapshot
+from eventos import Oyente
+from esquema import horarios, golf_horarios, futsal_horarios, futsal_intervalos, generaciones, verificar_esquema
+from metricas import API_SEGUNDOS, API_DB_SEGUNDOS, API_FILAS
 
 DATABASE_URL = os.environ["DATABASE_URL"]
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
-metadata.reflect(bind=engine)
-horarios = metadata.tables.get("horarios")
-golf_horarios = metadata.tables.get("golf_horarios")
-
-app = FastAPI()
-
-def formatear_hora_estandar(hora_str):
-    s = hora_str.replace('.', '').replace('AM', ' AM').replace('PM', ' PM').strip().upper()
-    formatos = ["%H:%M", "%I:%M %p", "%I:%M%p"]
-    dt = None
-    for fmt in formatos:
-        try:
-            dt = datetime.strptime(s, fmt)
-            break
-        except Exception:
-            continue
-    if dt is None:
-        return hora_str
-    return dt.strftime("%I:%M %p")
-
-def redondear_a_media_hora(hora_str):
-    # Siempre usa la función formatear_hora_estandar para entrada
-    s = hora_str.replace('.', '').replace('AM', ' AM').replace('PM', ' PM').strip().upper()
-    formatos = ["%H:%M", "%I:%M %p", "%I:%M%p"]
-    dt = None
-    for fmt in formatos:
+
+# Pool de conexiones: configurable para no quedarse sin conexiones en un pico
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+
+def url_async(url):
+    for prefijo in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefijo):
+            return "postgresql+asyncpg://" + url[len(prefijo):]
+    return url
+
+def url_libpq(url):
+    for prefijo in ("postgresql+psycopg2://", "postgresql+asyncpg://"):
+        if url.startswith(prefijo):
+            return "postgresql://" + url[len(prefijo):]
+    return url
+
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+)
+# Modo async: los handlers esperan a asyncpg en el event loop en vez de
+# ocupar un worker del threadpool por request
+async_engine = create_async_engine(
+    url_async(DATABASE_URL),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+) if DB_ASYNC else None
+
+# Snapshot en memoria: los endpoints lo consultan primero y sólo van a
+# Postgres para fechas fuera de la ventana cargada
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") == "1"
+# Engine propio: la carga completa de la ventana no entra en el
+# statement_timeout de los requests (0 = sin límite) y no le saca
+# conexiones al pool de la API
+SNAPSHOT_STATEMENT_TIMEOUT_MS = int(os.getenv("SNAPSHOT_STATEMENT_TIMEOUT_MS", "0"))
+snapshot_engine = create_engine(
+    DATABASE_URL,
+    pool_size=1,
+    max_overflow=0,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={"options": f"-c statement_timeout={SNAPSHOT_STATEMENT_TIMEOUT_MS}"}
+)
+snapshot = Snapshot(
+    snapshot_engine,
+    {"horarios": horarios, "golf_horarios": golf_horarios} if SNAPSHOT_ENABLED else {},
+    intervalo=int(os.getenv("SNAPSHOT_POLL_SEGUNDOS", "30"))
+)
+
+# Cambios de disponibilidad empujados por publicar_tabla (NOTIFY), para que
+# los clientes no tengan que pollear los endpoints de foto completa
+EVENTOS_ENABLED = os.getenv("EVENTOS_ENABLED", "1") == "1"
+EVENTOS_MAX_SUSCRIPCIONES = int(os.getenv("EVENTOS_MAX_SUSCRIPCIONES", "1000"))
+EVENTOS_KEEPALIVE_SEGUNDOS = int(os.getenv("EVENTOS_KEEPALIVE_SEGUNDOS", "15"))
+oyente = Oyente(url_libpq(DATABASE_URL), os.getenv("EVENTOS_CANAL", "disponibilidad"))
+
+# Los datos sólo cambian cuando se publica una generación; el ETag lo sigue y
+# max-age acota cuánto puede un cliente servir una copia sin revalidar
+CACHE_MAX_AGE = int(os.getenv("CACHE_MAX_AGE", "60"))
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Arranque: hilos de fondo (esquema, generaciones/snapshot, eventos)
+    threading.Thread(target=_chequear_esquema, daemon=True).start()
+    # Aunque el snapshot esté apagado el hilo sigue las generaciones (ETag)
+    snapshot.iniciar()
+    if EVENTOS_ENABLED:
+        oyente.iniciar()
+    yield
+    # Cierre: se devuelven las conexiones de los engines
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+    snapshot_engine.dispose()
+
+app = FastAPI(lifespan=ciclo_de_vida)
+
+# Readiness: el chequeo de esquema corre en background, nunca en el import
+READY_POLL_SEGUNDOS = int(os.getenv("READY_POLL_SEGUNDOS", "15"))
+estado_esquema = {"ok": False, "problemas": ["esquema todavía no verificado"]}
+
+# Todas las tablas que leen los endpoints (generaciones: ETag y snapshot)
+TABLAS_API = [horarios, golf_horarios, futsal_horarios, futsal_intervalos, generaciones]
+
+def _chequear_esquema():
+    while True:
         try:
-            dt = datetime.strptime(s, fmt)
-            break
-        except Exception:
-            continue
-    if dt is None:
-        return hora_str
-    minute = dt.minute
-    if minute < 15:
-        rounded_minute = 0
-    elif minute < 45:
-        rounded_minute = 30
-    else:
-        dt += timedelta(hours=1)
-        rounded_minute = 0
-    dt = dt.replace(minute=rounded_minute, second=0)
-    return dt.strftime("%I:%M %p")
+            with engine.connect() as conn:
+                problemas = verificar_esquema(conn, TABLAS_API)
+        except Exception as e:
+            problemas = [f"sin conexión a la base: {e}"]
+        estado_esquema["problemas"] = problemas
+        estado_esquema["ok"] = not problemas
+        time.sleep(READY_POLL_SEGUNDOS)
+
+def parsear_fecha_param(fecha):
+    fecha_val = parsear_fecha(fecha)
+    if fecha_val is None:
+        raise HTTPException(status_code=422, detail=f"Fecha inválida: {fecha}")
+    return fecha_val
+
+def parsear_hora_param(hora):
+    hora_val = parsear_hora(hora)
+    if hora_val is None:
+        raise HTTPException(status_code=422, detail=f"Hora inválida: {hora}")
+    return hora_val
+
+def columnas_api(tabla):
+    # fecha/hora ya vienen tipadas: se formatean en SQL con el mismo formato
+    # que devolvía la API cuando eran TEXT
+    columnas = []
+    for c in tabla.c:
+        if c.name == "fecha":
+            columnas.append(func.to_char(c, "YYYYMMDD").label("fecha"))
+        elif c.name == "hora":
+            columnas.append(func.to_char(c, "HH12:MI AM").label("hora"))
+        elif c.name == "hora_bucket":
+            columnas.append(func.to_char(c, "HH12:MI AM").label("hora_redondeada"))
+        else:
+            columnas.append(c)
+    return columnas
+
+def filtrar(query, tabla, fecha, venue=None, hora=None, bucket=None):
+    query = query.where(tabla.c.fecha == fecha)
+    if venue:
+        query = query.where(tabla.c.venue == venue)
+    if hora:
+        query = query.where(tabla.c.hora == hora)
+    if bucket:
+        query = query.where(tabla.c.hora_bucket == bucket)
+    return query
+
+def _ejecutar_sync(query, params=None):
+    with engine.connect() as conn:
+        return conn.execute(query, params).all()
+
+async def ejecutar(query, params=None):
+    with API_DB_SEGUNDOS.labels(endpoint_actual.get()).time():
+        if async_engine is not None:
+            async with async_engine.connect() as conn:
+                return (await conn.execute(query, params)).all()
+        return await run_in_threadpool(_ejecutar_sync, query, params)
+
+def parsear_params(fecha, hora=None, hora_redondeada=None):
+    fecha_val = parsear_fecha_param(fecha)
+    hora_val = parsear_hora_param(hora) if hora else None
+    bucket_val = bucket_media_hora(parsear_hora_param(hora_redondeada)) if hora_redondeada else None
+    return fecha_val, hora_val, bucket_val
+
+# Deportes de los endpoints multi-deporte y las tablas que lee cada uno
+TABLAS_DEPORTE = {
+    "tennis": ["horarios"],
+    "golf": ["golf_horarios"],
+    "futsal": ["futsal_horarios", "futsal_intervalos"],
+}
+DEPORTES = tuple(TABLAS_DEPORTE)
+
+def lista_param(valores):
+    """Valores de un parámetro que se puede repetir o separar por comas."""
+    return [v for valor in (valores or []) for v in valor.split(",") if v]
+
+def parsear_deportes(deporte, por_defecto=DEPORTES):
+    deportes = set(lista_param(deporte or por_defecto))
+    if not deportes <= set(DEPORTES):
+        raise HTTPException(status_code=422, detail=f"Deporte inválido: {sorted(deportes - set(DEPORTES))}")
+    return deportes
+
+def tablas_de(deportes):
+    return sorted(tabla for d in deportes for tabla in TABLAS_DEPORTE[d])
+
+def filtro_venues(filtrar, columna="venue"):
+    """Condición SQL para el parámetro :venues sobre `columna` (con alias si hace falta)."""
+    return f"AND {columna} = ANY(:venues)" if filtrar else ""
+
+def etag_para(request, tablas):
+    """ETag de la generación publicada de cada tabla + los parámetros de la
+    query. None si todavía no se conoce la generación (no se cachea)."""
+    gens = [snapshot.generaciones.get(tabla) for tabla in tablas]
+    if any(g is None for g in gens):
+        return None
+    clave = f"{request.url.path}|{sorted(request.query_params.multi_items())}|{gens}"
+    return '"' + hashlib.sha1(clave.encode()).hexdigest()[:20] + '"'
+
+def headers_cache(etag):
+    return {"ETag": etag, "Cache-Control": f"public, max-age={CACHE_MAX_AGE}"}
+
+def no_modificado(request, etag):
+    if etag is None:
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    candidatos = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    if "*" in candidatos or etag in candidatos:
+        return Response(status_code=304, headers=headers_cache(etag))
+    return None
+
+def revalidar(request, response, tablas):
+    """(etag, respuesta 304 o None) para un endpoint que lee `tablas`. Si
+    hay que responder, deja ETag y Cache-Control en `response` (None para
+    los que arman su propia respuesta con headers_cache)."""
+    etag = etag_para(request, tablas)
+    respuesta_304 = no_modificado(request, etag)
+    if etag and respuesta_304 is None and response is not None:
+        response.headers.update(headers_cache(etag))
+    return etag, respuesta_304
+
+# ──────────────────────────────────────────────────────────────
+# Métricas: latencia por endpoint, tiempo de DB y filas devueltas
+# ──────────────────────────────────────────────────────────────
+endpoint_actual = contextvars.ContextVar("endpoint_actual", default="otro")
+
+@app.middleware("http")
+async def medir_request(request: Request, call_next):
+    # Sólo rutas conocidas como label, para no abrir una serie por cada 404
+    rutas = {ruta.path for ruta in app.routes}
+    endpoint = request.url.path if request.url.path in rutas else "otro"
+    endpoint_actual.set(endpoint)
+    t0 = time.perf_counter()
+    status = "500"
+    try:
+        response = await call_next(request)
+        status = str(response.status_code)
+        return response
+    finally:
+        API_SEGUNDOS.labels(endpoint, status).observe(time.perf_counter() - t0)
+
+def devolver(filas, cantidad=None):
+    API_FILAS.labels(endpoint_actual.get()).observe(len(filas) if cantidad is None else cantidad)
+    return filas
+
+@app.get("/metrics")
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    if not estado_esquema["ok"]:
+        raise HTTPException(status_code=503, detail=estado_esquema["problemas"])
+    return {"status": "ready"}
 
 @app.get("/disponibilidad_tennis")
-def disponibilidad_tennis(
+async def disponibilidad_tennis(
+    request: Request,
+    response: Response,
     fecha: str,
     venue: str = None,
     hora: str = None,
     hora_redondeada: str = None
 ):
-    if horarios is None:
-        raise HTTPException(status_code=500, detail="Tabla 'horarios' no existe en la base")
-    with engine.connect() as conn:
-        query = horarios.select().where(horarios.c.fecha == fecha)
-        if venue:
-            query = query.where(horarios.c.venue == venue)
-        if hora:
-            query = query.where(horarios.c.hora == hora)
-        result = conn.execute(query)
-        rows = [dict(row._mapping) for row in result]
-        for row in rows:
-            row["hora"] = formatear_hora_estandar(row["hora"])
-            row["hora_redondeada"] = redondear_a_media_hora(row["hora"])
-        if hora_redondeada:
-            hora_redondeada_norm = redondear_a_media_hora(hora_redondeada)
-            rows = [row for row in rows if row["hora_redondeada"] == hora_redondeada_norm]
-    return rows
+    _, respuesta_304 = revalidar(request, response, ["horarios"])
+    if respuesta_304:
+        return respuesta_304
+    fecha_val, hora_val, bucket_val = parsear_params(fecha, hora, hora_redondeada)
+    rows = snapshot.filas("horarios", fecha_val, venue, hora_val, bucket_val)
+    if rows is not None:
+        return devolver(rows)
+    query = filtrar(select(*columnas_api(horarios)), horarios, fecha_val, venue, hora_val, bucket_val)
+    rows = await ejecutar(query.order_by(horarios.c.venue, horarios.c.hora))
+    return devolver([dict(row._mapping) for row in rows])
 
 @app.get("/disponibilidad_golf")
-def disponibilidad_golf(
+async def disponibilidad_golf(
+    request: Request,
+    response: Response,
     fecha: str,
     venue: str = None,
     hora: str = None,
     hoyos: int = None,
     hora_redondeada: str = None
 ):
-    if golf_horarios is None:
-        raise HTTPException(status_code=500, detail="Tabla 'golf_horarios' no existe en la base")
-    with engine.connect() as conn:
-        query = golf_horarios.select().where(golf_horarios.c.fecha == fecha)
-        if venue:
-            query = query.where(golf_horarios.c.venue == venue)
-        if hora:
-            query = query.where(golf_horarios.c.hora == hora)
-        if hoyos:
-            query = query.where(golf_horarios.c.hoyos == hoyos)
-        result = conn.execute(query)
-        rows = [dict(row._mapping) for row in result]
-        for row in rows:
-            row["hora"] = formatear_hora_estandar(row["hora"])
-            row["hora_redondeada"] = redondear_a_media_hora(row["hora"])
-        if hora_redondeada:
-            hora_redondeada_norm = redondear_a_media_hora(hora_redondeada)
-            rows = [row for row in rows if row["hora_redondeada"] == hora_redondeada_norm]
-    return rows
+    _, respuesta_304 = revalidar(request, response, ["golf_horarios"])
+    if respuesta_304:
+        return respuesta_304
+    fecha_val, hora_val, bucket_val = parsear_params(fecha, hora, hora_redondeada)
+    rows = snapshot.filas(
+        "golf_horarios", fecha_val, venue, hora_val, bucket_val,
+        extra={"hoyos": hoyos} if hoyos else None
+    )
+    if rows is not None:
+        return devolver(rows)
+    query = filtrar(select(*columnas_api(golf_horarios)), golf_horarios, fecha_val, venue, hora_val, bucket_val)
+    if hoyos:
+        query = query.where(golf_horarios.c.hoyos == hoyos)
+    rows = await ejecutar(query.order_by(golf_horarios.c.venue, golf_horarios.c.hora))
+    return devolver([dict(row._mapping) for row in rows])
 
 @app.get("/disponibilidad_general")
-def disponibilidad_general(
+async def disponibilidad_general(
+    request: Request,
+    response: Response,
     fecha: str,
     hora: str = None,
     hora_redondeada: str = None,
     deporte: str = Query(None, regex="^(tennis|golf)?$"),
     venue: str = None
 ):
-    hora_redondeada_val = None
-    if hora_redondeada:
-        hora_redondeada_val = redondear_a_media_hora(hora_redondeada)
-    elif hora:
-        hora_redondeada_val = redondear_a_media_hora(hora)
-    venues_set = set()
+    tablas = []
+    if (deporte is None) or (deporte == "tennis"):
+        tablas.append(horarios)
+    if (deporte is None) or (deporte == "golf"):
+        tablas.append(golf_horarios)
+    _, respuesta_304 = revalidar(request, response, [tabla.name for tabla in tablas])
+    if respuesta_304:
+        return respuesta_304
 
-    with engine.connect() as conn:
-        if (deporte is None) or (deporte == "tennis"):
-            tennis_query = horarios.select().where(horarios.c.fecha == fecha)
-            if venue:
-                tennis_query = tennis_query.where(horarios.c.venue == venue)
-            if hora:
-                tennis_query = tennis_query.where(horarios.c.hora == hora)
-            tennis_rows = [dict(row._mapping) for row in conn.execute(tennis_query)]
-            for row in tennis_rows:
-                row["hora"] = formatear_hora_estandar(row["hora"])
-                row["hora_redondeada"] = redondear_a_media_hora(row["hora"])
-                if hora_redondeada_val:
-                    if row["hora_redondeada"] == hora_redondeada_val:
-                        venues_set.add(row["venue"])
-                else:
-                    venues_set.add(row["venue"])
-
-        if (deporte is None) or (deporte == "golf"):
-            golf_query = golf_horarios.select().where(golf_horarios.c.fecha == fecha)
-            if venue:
-                golf_query = golf_query.where(golf_horarios.c.venue == venue)
-            if hora:
-                golf_query = golf_query.where(golf_horarios.c.hora == hora)
-            golf_rows = [dict(row._mapping) for row in conn.execute(golf_query)]
-            for row in golf_rows:
-                row["hora"] = formatear_hora_estandar(row["hora"])
-                row["hora_redondeada"] = redondear_a_media_hora(row["hora"])
-                if hora_redondeada_val:
-                    if row["hora_redondeada"] == hora_redondeada_val:
-                        venues_set.add(row["venue"])
-                else:
-                    venues_set.add(row["venue"])
+    # Con sólo `hora`, el bucket se deriva de ella (igual que antes)
+    fecha_val, hora_val, bucket_val = parsear_params(fecha, hora, hora_redondeada or hora)
+
+    venues_set = set()
+    pendientes = []
+    for tabla in tablas:
+        encontrados = snapshot.venues(tabla.name, fecha_val, venue, hora_val, bucket_val)
+        if encontrados is None:
+            pendientes.append(tabla)
+        else:
+            venues_set.update(encontrados)
+    for tabla in pendientes:
+        query = filtrar(select(tabla.c.venue).distinct(), tabla, fecha_val, venue, hora_val, bucket_val)
+        venues_set.update(row[0] for row in await ejecutar(query))
 
     status = "Available" if venues_set else "NonAvailable"
-    return {
+    return devolver({
         "status": status,
         "venues_count": len(venues_set),
         "venues": sorted(list(venues_set))
+    }, cantidad=len(venues_set))
+
+# Inicios posibles de N minutos dentro de los intervalos libres de Pittwater,
+# cada FUTSAL_PASO_MINUTOS desde el comienzo del intervalo. El filtro por
+# rango (&&) usa el índice GiST de futsal_intervalos.rango.
+FUTSAL_PASO_MINUTOS = int(os.getenv("FUTSAL_PASO_MINUTOS", "30"))
+SQL_FUTSAL_INTERVALOS = """
+    SELECT i.venue, i.court, i.link, s.inicio,
+           (EXTRACT(EPOCH FROM upper(i.rango) - s.inicio) / 60)::int AS minutos_libres
+    FROM futsal_intervalos i
+    CROSS JOIN LATERAL generate_series(
+        lower(i.rango),
+        upper(i.rango) - make_interval(mins => :minutos),
+        make_interval(mins => :paso)
+    ) AS s(inicio)
+    WHERE i.fecha = :fecha
+      AND i.rango && tsrange(:desde, :hasta)
+      AND s.inicio BETWEEN :desde_inicio AND :hasta_inicio
+      {filtro_venue}
+    ORDER BY s.inicio, i.venue, i.court
+"""
+
+@app.get("/disponibilidad_futsal")
+async def disponibilidad_futsal(
+    request: Request,
+    response: Response,
+    fecha: str,
+    minutos: int = Query(60, ge=1),
+    hora: str = None,
+    tolerancia: int = Query(60, ge=0),
+    venue: str = None
+):
+    _, respuesta_304 = revalidar(request, response, ["futsal_horarios", "futsal_intervalos"])
+    if respuesta_304:
+        return respuesta_304
+
+    fecha_val = parsear_fecha_param(fecha)
+    dia = datetime.combine(fecha_val, datetime.min.time())
+    # "cerca de `hora`": inicios dentro de ±tolerancia minutos
+    if hora:
+        centro = datetime.combine(fecha_val, parsear_hora_param(hora))
+        desde_inicio = max(dia, centro - timedelta(minutes=tolerancia))
+        hasta_inicio = min(dia + timedelta(days=1), centro + timedelta(minutes=tolerancia))
+    else:
+        desde_inicio, hasta_inicio = dia, dia + timedelta(days=1)
+
+    rows = []
+    params = {
+        "fecha": fecha_val,
+        "minutos": minutos,
+        "paso": FUTSAL_PASO_MINUTOS,
+        "desde": desde_inicio,
+        "hasta": hasta_inicio + timedelta(minutes=minutos),
+        "desde_inicio": desde_inicio,
+        "hasta_inicio": hasta_inicio,
     }
+    filtro_venue = ""
+    if venue:
+        filtro_venue = "AND i.venue = :venue"
+        params["venue"] = venue
+    for row in await ejecutar(text(SQL_FUTSAL_INTERVALOS.format(filtro_venue=filtro_venue)), params):
+        rows.append((row.inicio, {
+            "venue": row.venue,
+            "court": row.court,
+            "fecha": fecha_val.strftime("%Y%m%d"),
+            "hora": formatear_hora(row.inicio.time()),
+            "minutos": minutos,
+            "minutos_libres": row.minutos_libres,
+            "link": row.link,
+        }))
+
+    # KIKOFF vende turnos de duración fija: se devuelven los de al menos N minutos
+    query = select(futsal_horarios).where(
+        futsal_horarios.c.fecha == fecha_val,
+        futsal_horarios.c.minutos >= minutos,
+        futsal_horarios.c.venue != "Pittwater RSL"
+    )
+    if hora:
+        query = query.where(futsal_horarios.c.hora.between(
+            desde_inicio.time(),
+            (hasta_inicio - timedelta(microseconds=1)).time() if hasta_inicio.date() > fecha_val else hasta_inicio.time()
+        ))
+    if venue:
+        query = query.where(futsal_horarios.c.venue == venue)
+    for row in await ejecutar(query):
+        rows.append((datetime.combine(fecha_val, row.hora), {
+            "venue": row.venue,
+            "court": row.court,
+            "fecha": fecha_val.strftime("%Y%m%d"),
+            "hora": formatear_hora(row.hora),
+            "minutos": row.minutos,
+            "minutos_libres": row.minutos,
+            "link": row.link,
+        }))
+
+    rows.sort(key=lambda r: (r[0], r[1]["venue"], r[1]["court"]))
+    return devolver([fila for _, fila in rows])
+
+# ──────────────────────────────────────────────────────────────
+# Rango de fechas: matriz venue x día x media hora en NDJSON
+#
+# Una sola query (UNION ALL por deporte, agrupada por el índice
+# fecha/venue/hora_bucket) que arma cada línea JSON en Postgres; la
+# respuesta se va mandando por lotes con un cursor del lado del servidor,
+# así la memoria no crece con el tamaño de la ventana.
+# ──────────────────────────────────────────────────────────────
+RANGO_MAX_DIAS = int(os.getenv("RANGO_MAX_DIAS", "62"))
+RANGO_LOTE = int(os.getenv("RANGO_LOTE", "1000"))
+
+def _linea_json(deporte, venue, fecha, hora, extra="", slots="count(*)"):
+    return (
+        f"json_build_object('deporte', '{deporte}', 'venue', {venue}, "
+        f"'fecha', to_char({fecha}, 'YYYYMMDD'), 'hora_redondeada', to_char({hora}, 'HH12:MI AM'), "
+        f"'slots', {slots}{extra})::text AS linea"
+    )
+
+def _bucket_media_hora(ts):
+    # Igual que normalizacion.bucket_media_hora (la media hora más cercana,
+    # :15 y :45 suben), para que las celdas de Pittwater caigan en los mismos
+    # buckets que hora_bucket de las demás tablas
+    return (
+        f"(date_trunc('hour', {ts}) + make_interval(mins => "
+        f"(EXTRACT(MINUTE FROM {ts})::int + 15) / 30 * 30))::time"
+    )
+
+def sql_rango(deportes, filtrar_venues, hoyos):
+    filtro_venue = filtro_venues(filtrar_venues)
+    partes = []
+    if "tennis" in deportes:
+        partes.append(f"""
+            SELECT fecha, venue, hora_bucket AS bucket, {_linea_json("tennis", "venue", "fecha", "hora_bucket")}
+            FROM horarios
+            WHERE fecha BETWEEN :desde AND :hasta {filtro_venue}
+            GROUP BY fecha, venue, hora_bucket
+        """)
+    if "golf" in deportes:
+        partes.append(f"""
+            SELECT fecha, venue, hora_bucket AS bucket,
+                   {_linea_json("golf", "venue", "fecha", "hora_bucket", ", 'lugares', sum(lugares)")}
+            FROM golf_horarios
+            WHERE fecha BETWEEN :desde AND :hasta {filtro_venue}
+              {"AND hoyos = :hoyos" if hoyos else ""}
+            GROUP BY fecha, venue, hora_bucket
+        """)
+    if "futsal" in deportes:
+        # KIKOFF: turnos de al menos N minutos, contando cada inicio una vez
+        # aunque entren varias duraciones; Pittwater: inicios donde entran N
+        # minutos dentro de un intervalo libre (igual que /disponibilidad_futsal)
+        partes.append(f"""
+            SELECT fecha, venue, hora_bucket AS bucket,
+                   {_linea_json("futsal", "venue", "fecha", "hora_bucket", slots="count(DISTINCT (hora, court))")}
+            FROM futsal_horarios
+            WHERE fecha BETWEEN :desde AND :hasta AND minutos >= :minutos
+              AND venue != 'Pittwater RSL' {filtro_venue}
+            GROUP BY fecha, venue, hora_bucket
+        """)
+        partes.append(f"""
+            SELECT fecha, venue, bucket, {_linea_json("futsal", "venue", "fecha", "bucket")}
+            FROM (
+                SELECT i.fecha, i.venue, {_bucket_media_hora("s.inicio")} AS bucket
+                FROM futsal_intervalos i
+                CROSS JOIN LATERAL generate_series(
+                    lower(i.rango),
+                    upper(i.rango) - make_interval(mins => :minutos),
+                    make_interval(mins => :paso)
+                ) AS s(inicio)
+                WHERE i.fecha BETWEEN :desde AND :hasta {filtro_venues(filtrar_venues, "i.venue")}
+            ) p
+            GROUP BY fecha, venue, bucket
+        """)
+    return "SELECT linea FROM (" + " UNION ALL ".join(partes) + ") m ORDER BY fecha, venue, bucket, linea"
+
+def _stream_sync(query, params, endpoint):
+    filas = 0
+    with engine.connect().execution_options(stream_results=True, yield_per=RANGO_LOTE) as conn:
+        for lote in conn.execute(query, params).partitions(RANGO_LOTE):
+            filas += len(lote)
+            yield "".join(f"{linea}\n" for (linea,) in lote)
+    API_FILAS.labels(endpoint).observe(filas)
+
+async def _stream_async(query, params, endpoint):
+    filas = 0
+    async with async_engine.connect() as conn:
+        result = await conn.stream(query, params)
+        async for lote in result.partitions(RANGO_LOTE):
+            filas += len(lote)
+            yield "".join(f"{linea}\n" for (linea,) in lote)
+    API_FILAS.labels(endpoint).observe(filas)
+
+@app.get("/disponibilidad_rango")
+async def disponibilidad_rango(
+    request: Request,
+    fecha_desde: str,
+    fecha_hasta: str,
+    deporte: List[str] = Query(None),
+    venue: List[str] = Query(None),
+    hoyos: int = None,
+    minutos: int = Query(60, ge=1)
+):
+    desde = parsear_fecha_param(fecha_desde)
+    hasta = parsear_fecha_param(fecha_hasta)
+    if hasta < desde:
+        raise HTTPException(status_code=422, detail="fecha_hasta es anterior a fecha_desde")
+    if (hasta - desde).days >= RANGO_MAX_DIAS:
+        raise HTTPException(status_code=422, detail=f"El rango no puede superar {RANGO_MAX_DIAS} días")
+    deportes = parsear_deportes(deporte)
+    venues = lista_param(venue)
+
+    # StreamingResponse lleva sus propios headers: sin `response`
+    etag, respuesta_304 = revalidar(request, None, tablas_de(deportes))
+    if respuesta_304:
+        return respuesta_304
+
+    params = {"desde": desde, "hasta": hasta, "minutos": minutos, "paso": FUTSAL_PASO_MINUTOS}
+    if venues:
+        params["venues"] = venues
+    if hoyos:
+        params["hoyos"] = hoyos
+    query = text(sql_rango(deportes, bool(venues), hoyos))
+    endpoint = endpoint_actual.get()
+    if async_engine is not None:
+        cuerpo = _stream_async(query, params, endpoint)
+    else:
+        cuerpo = _stream_sync(query, params, endpoint)
+    return StreamingResponse(
+        cuerpo,
+        media_type="application/x-ndjson",
+        headers=headers_cache(etag) if etag else None
+    )
+
+# ──────────────────────────────────────────────────────────────
+# Próximos K slots libres desde una fecha/hora
+#
+# Cada deporte es un index scan sobre (fecha, hora) que arranca en el
+# momento pedido y corta apenas junta K filas (LIMIT), así el costo depende
+# de K y no del tamaño de la ventana. Las ramas se unen y se vuelve a
+# ordenar sólo ese puñado de filas.
+# ──────────────────────────────────────────────────────────────
+PROXIMOS_MAX_K = int(os.getenv("PROXIMOS_MAX_K", "100"))
+PROXIMOS_MAX_DIAS = int(os.getenv("PROXIMOS_MAX_DIAS", "28"))
+
+def sql_proximos(deportes, filtrar_venues, hoyos):
+    # Todas las ramas llevan alias: cualquiera puede quedar primera en el UNION
+    filtro_venue = filtro_venues(filtrar_venues)
+    ramas = []
+    if "tennis" in deportes:
+        ramas.append(f"""
+            SELECT 'tennis' AS deporte, venue, fecha, hora, cancha, link,
+                   NULL::int AS hoyos, NULL::int AS lugares, NULL::int AS minutos
+            FROM horarios
+            WHERE (fecha, hora) >= (:fecha, :hora) AND fecha <= :hasta {filtro_venue}
+            ORDER BY fecha, hora LIMIT :k
+        """)
+    if "golf" in deportes:
+        ramas.append(f"""
+            SELECT 'golf' AS deporte, venue, fecha, hora, NULL::text AS cancha, link,
+                   hoyos, lugares, NULL::int AS minutos
+            FROM golf_horarios
+            WHERE (fecha, hora) >= (:fecha, :hora) AND fecha <= :hasta {filtro_venue}
+              {"AND hoyos = :hoyos" if hoyos else ""}
+            ORDER BY fecha, hora LIMIT :k
+        """)
+    if "futsal" in deportes:
+        # KIKOFF guarda una fila por inicio y duración: un solo inicio por
+        # cancha (con la duración más corta que alcanza) antes del LIMIT,
+        # si no las copias del mismo turno se comen los K
+        ramas.append(f"""
+            SELECT DISTINCT ON (fecha, hora, venue, court)
+                   'futsal' AS deporte, venue, fecha, hora, court AS cancha, link,
+                   NULL::int AS hoyos, NULL::int AS lugares, minutos
+            FROM futsal_horarios
+            WHERE (fecha, hora) >= (:fecha, :hora) AND fecha <= :hasta
+              AND minutos >= :minutos AND venue != 'Pittwater RSL' {filtro_venue}
+            ORDER BY fecha, hora, venue, court, minutos LIMIT :k
+        """)
+        # Pittwater: primer inicio de cada intervalo (en pasos de
+        # FUTSAL_PASO_MINUTOS desde su comienzo) donde entran N minutos
+        ramas.append(f"""
+            SELECT 'futsal' AS deporte, venue, inicio::date AS fecha, inicio::time AS hora,
+                   court AS cancha, link, NULL::int AS hoyos, NULL::int AS lugares,
+                   CAST(:minutos AS int) AS minutos
+            FROM (
+                SELECT i.venue, i.court, i.link, i.rango,
+                       lower(i.rango) + make_interval(mins => :paso) * ceil(greatest(0,
+                           EXTRACT(EPOCH FROM CAST(:momento AS timestamp) - lower(i.rango)) / 60) / :paso) AS inicio
+                FROM futsal_intervalos i
+                WHERE i.fecha BETWEEN :fecha AND :hasta
+                  AND upper(i.rango) >= CAST(:momento AS timestamp) + make_interval(mins => :minutos)
+                  {filtro_venues(filtrar_venues, "i.venue")}
+            ) p
+            WHERE inicio + make_interval(mins => :minutos) <= upper(rango)
+            ORDER BY p.inicio LIMIT :k
+        """)
+    union = " UNION ALL ".join(f"({rama})" for rama in ramas)
+    return f"SELECT * FROM ({union}) proximos ORDER BY fecha, hora, venue LIMIT :k"
+
+@app.get("/proxima_disponibilidad")
+async def proxima_disponibilidad(
+    request: Request,
+    response: Response,
+    fecha: str = None,
+    hora: str = None,
+    k: int = Query(10, ge=1),
+    deporte: List[str] = Query(None),
+    venue: List[str] = Query(None),
+    hoyos: int = None,
+    minutos: int = Query(60, ge=1)
+):
+    # Sin fecha/hora: desde ahora (hora de los venues, no del contenedor en
+    # UTC). Con fecha y sin hora: desde el comienzo del día
+    ahora = ahora_venues()
+    fecha_val = parsear_fecha_param(fecha) if fecha else ahora.date()
+    hora_val = parsear_hora_param(hora) if hora else (ahora.time() if not fecha else datetime.min.time())
+    if k > PROXIMOS_MAX_K:
+        raise HTTPException(status_code=422, detail=f"k no puede superar {PROXIMOS_MAX_K}")
+    deportes = parsear_deportes(deporte)
+    venues = lista_param(venue)
+
+    # Sin fecha/hora la respuesta depende del reloj: no se cachea
+    if fecha:
+        _, respuesta_304 = revalidar(request, response, tablas_de(deportes))
+        if respuesta_304:
+            return respuesta_304
+
+    params = {
+        "fecha": fecha_val,
+        "hora": hora_val,
+        "momento": datetime.combine(fecha_val, hora_val),
+        "hasta": fecha_val + timedelta(days=PROXIMOS_MAX_DIAS),
+        "k": k,
+        "minutos": minutos,
+        "paso": FUTSAL_PASO_MINUTOS,
+    }
+    if venues:
+        params["venues"] = venues
+    if hoyos:
+        params["hoyos"] = hoyos
+    rows = await ejecutar(text(sql_proximos(deportes, bool(venues), hoyos)), params)
+    return devolver([{
+        "deporte": row.deporte,
+        "venue": row.venue,
+        "fecha": row.fecha.strftime("%Y%m%d"),
+        "hora": formatear_hora(row.hora),
+        "cancha": row.cancha,
+        "link": row.link,
+        "hoyos": row.hoyos,
+        "lugares": row.lugares,
+        "minutos": row.minutos,
+    } for row in rows])
+
+# ──────────────────────────────────────────────────────────────
+# Feed de cambios (Server-Sent Events)
+#
+# Cada publicación que agrega, saca o modifica slots llega como un evento
+# `aparecio` / `desaparecio` / `cambio` con los slots en el formato de la
+# API, filtrados por deporte/venue/fecha. `recargar` avisa que se perdieron
+# eventos (migración, cliente lento, reconexión): hay que volver a pedir la
+# foto con los endpoints de disponibilidad. No hay replay: al reconectar,
+# el cliente recarga y sigue escuchando.
+# ──────────────────────────────────────────────────────────────
+def _evento_sse(mensaje):
+    id_evento = f"id: {mensaje['tabla']}:{mensaje['generacion']}\n" if mensaje["tabla"] else ""
+    datos = json.dumps({k: v for k, v in mensaje.items() if k != "tipo"})
+    return f"{id_evento}event: {mensaje['tipo']}\ndata: {datos}\n\n"
+
+async def _stream_eventos(request, sub):
+    try:
+        yield f"retry: {oyente.reintento * 1000}\n\n"
+        while not await request.is_disconnected():
+            try:
+                mensaje = await asyncio.wait_for(sub.cola.get(), EVENTOS_KEEPALIVE_SEGUNDOS)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ": ping\n\n"
+                continue
+            filtrado = sub.filtrar(mensaje)
+            if filtrado is not None:
+                yield _evento_sse(filtrado)
+    finally:
+        oyente.desuscribir(sub)
+
+@app.get("/disponibilidad_eventos")
+async def disponibilidad_eventos(
+    request: Request,
+    deporte: List[str] = Query(None),
+    venue: List[str] = Query(None),
+    fecha: List[str] = Query(None)
+):
+    if not EVENTOS_ENABLED:
+        raise HTTPException(status_code=404, detail="Eventos deshabilitados")
+    if len(oyente.suscripciones) >= EVENTOS_MAX_SUSCRIPCIONES:
+        raise HTTPException(status_code=503, detail="Demasiados clientes conectados")
+    deportes = parsear_deportes(deporte, por_defecto=())
+    venues = set(lista_param(venue))
+    fechas = {parsear_fecha_param(f).strftime("%Y%m%d") for f in lista_param(fecha)}
+    sub = oyente.suscribir(deportes=deportes, venues=venues, fechas=fechas)
+    return StreamingResponse(
+        _stream_eventos(request, sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
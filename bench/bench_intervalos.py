@@ -0,0 +1,103 @@
+"""Benchmark de expand_consecutive_blocks: implementación vieja (loop por fila +
+sets de ticks) vs motor vectorizado de bench/intervalos_ticks.py, sobre
+bloques libres sintéticos de canchas x días. Verifica además que la salida
+sea idéntica. Requiere numpy (no está en requirements.txt).
+
+    python bench/bench_intervalos.py --canchas 20 --dias 28
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from intervalos_ticks import expand_consecutive_blocks
+from registros import BloqueLibre, SlotFutsal
+
+LINK = "https://pittwater-rsl-futsal.yepbooking.com.au/"
+
+def expand_consecutive_blocks_viejo(bloques):
+    # Copia de la implementación original de soccer_scrapper, como referencia
+    # (el groupby de pandas pasado a itertools, mismo orden de grupos)
+    expanded_rows = []
+    clave = lambda b: (b.venue, b.court, b.fecha)
+    for (venue, court, fecha), group in groupby(sorted(bloques, key=clave), key=clave):
+        slots = []
+        for row in group:
+            start_str = f"{row.fecha} {row.hora_inicio}"
+            end_str = f"{row.fecha} {row.hora_fin}"
+            start_dt = datetime.strptime(start_str, "%d-%m-%Y %I:%M%p")
+            end_dt = datetime.strptime(end_str, "%d-%m-%Y %I:%M%p")
+            slots.append((start_dt, end_dt))
+
+        slots.sort()
+        available = set()
+        for start, end in slots:
+            t = start
+            while t + timedelta(minutes=30) <= end:
+                available.add(t)
+                t += timedelta(minutes=30)
+        available = sorted(available)
+
+        for i in range(len(available)):
+            t0 = available[i]
+            for duration in [30, 60, 90, 120]:
+                end_t = t0 + timedelta(minutes=duration)
+                if all(t0 + timedelta(minutes=30 * k) in available for k in range(duration // 30)):
+                    expanded_rows.append(SlotFutsal(
+                        venue, t0.strftime("%Y%m%d"), t0.strftime("%I:%M %p"), duration, court, LINK
+                    ))
+    return expanded_rows
+
+def bloques_sinteticos(canchas, dias, seed=0):
+    rnd = random.Random(seed)
+    hoy = date.today()
+    filas = []
+    for c in range(1, canchas + 1):
+        for d in range(dias):
+            fecha = (hoy + timedelta(days=d)).strftime("%d-%m-%Y")
+            # Grilla de 30' entre 7am y 11pm, libre con prob. 0.6, más algún
+            # bloque desfasado 15' para ejercitar fases distintas
+            for m in range(7 * 60, 23 * 60, 30):
+                if rnd.random() < 0.6:
+                    inicio = m + (15 if rnd.random() < 0.05 else 0)
+                    fin = inicio + rnd.choice([30, 30, 60])
+                    filas.append(BloqueLibre(
+                        "Pittwater RSL", f"Court {c}", fecha, fmt(inicio), fmt(min(fin, 23 * 60 + 59))
+                    ))
+    return filas
+
+def fmt(minutos):
+    return (datetime(2000, 1, 1) + timedelta(minutes=minutos)).strftime("%I:%M%p").lstrip("0").lower()
+
+def medir(fn, bloques, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        out = fn(bloques)
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--canchas", type=int, default=10)
+    ap.add_argument("--dias", type=int, default=28)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    args = ap.parse_args()
+
+    bloques = bloques_sinteticos(args.canchas, args.dias)
+    t_viejo, viejo = medir(expand_consecutive_blocks_viejo, bloques, args.repeticiones)
+    t_nuevo, nuevo = medir(lambda b: expand_consecutive_blocks(b, link=LINK), bloques, args.repeticiones)
+
+    iguales = viejo == nuevo
+    print(f"bloques de entrada: {len(bloques)}  filas de salida: {len(nuevo)}  salida idéntica: {iguales}")
+    print(f"viejo:       {t_viejo * 1000:10.1f} ms")
+    print(f"vectorizado: {t_nuevo * 1000:10.1f} ms  ({t_viejo / t_nuevo:.1f}x)")
+    if not iguales:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Benchmark offline: scrapers contra el stub local, escritura en Postgres y
+latencia de la API, sin tocar MiClub, tennisvenues, YepBooking ni Squarespace.
+
+    BENCH_DATABASE_URL=postgresql://localhost/focusports_bench python bench/bench_offline.py
+
+Sin BENCH_DATABASE_URL levanta un Postgres descartable con initdb/pg_ctl (si
+están en el PATH) en un directorio temporal. SQLite no sirve: los scrapers
+escriben con psycopg2 (COPY), staging UNLOGGED y tsrange.
+¡Nunca apuntarlo a la base de producción! Crea y pisa las tablas vivas.
+
+Tres etapas (--etapas):
+  escritura  siembra las cuatro tablas a escala (venues x 28 días) y mide
+             guardar_* y publicar_tabla: carga inicial, re-publicación sin
+             cambios y con ~5% de slots desaparecidos
+  scrape     corre cada scraper contra el stub (dos veces: la segunda pasa
+             por las huellas) y mide páginas/s
+  api        levanta uvicorn sobre la base sembrada y mide p50/p95/p99 de
+             cada endpoint por nivel de concurrencia
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import stub_server
+from loadtest_api import correr_nivel, percentil
+
+# ──────────────────────────────────────────────────────────────
+# Postgres descartable
+# ──────────────────────────────────────────────────────────────
+def postgres_temporal():
+    """Levanta un cluster en un directorio temporal. Devuelve (url, función para pararlo)."""
+    if not (shutil.which("initdb") and shutil.which("pg_ctl")):
+        raise SystemExit("❌ Sin BENCH_DATABASE_URL y sin initdb/pg_ctl en el PATH.")
+    directorio = tempfile.mkdtemp(prefix="focusports_bench_")
+    datos = os.path.join(directorio, "datos")
+    subprocess.run(["initdb", "-D", datos, "-U", "postgres", "-A", "trust"], check=True, stdout=subprocess.DEVNULL)
+    subprocess.run(
+        ["pg_ctl", "-D", datos, "-w", "-l", os.path.join(directorio, "log"),
+         "-o", f"-k {directorio} -c listen_addresses='' -c fsync=off", "start"],
+        check=True, stdout=subprocess.DEVNULL
+    )
+
+    def parar():
+        subprocess.run(["pg_ctl", "-D", datos, "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    return f"postgresql://postgres@/postgres?host={directorio}", parar
+
+def configurar_entorno(base):
+    # Antes de importar los scrapers: leen las URLs al cargar el módulo
+    os.environ["TENNIS_BASE_URL"] = f"{base}/tennis"
+    os.environ["GOLF_BASE_URL"] = f"{base}/golf/{{domain}}"
+    os.environ["KIKOFF_API_URL"] = f"{base}/kikoff/availability/times"
+    os.environ["PITTWATER_URL"] = f"{base}/pittwater/"
+    # El stub no limita: medir el scraper, no la cortesía con los sitios
+    os.environ["LIMITE_ENABLED"] = "0"
+
+def a_date(fecha):
+    return datetime.strptime(fecha, "%Y%m%d").date()
+
+def fechas_horizonte(dias):
+    hoy = date.today()
+    return [(hoy + timedelta(days=i)).strftime("%Y%m%d") for i in range(dias)]
+
+def medir(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    resultado = fn(*args, **kwargs)
+    return time.perf_counter() - t0, resultado
+
+# ──────────────────────────────────────────────────────────────
+# Escritura: siembra a escala + tiempos de guardar_* / publicar_tabla
+# ──────────────────────────────────────────────────────────────
+def filas_tennis(venues, fechas):
+    from registros import SlotTennis
+    return [
+        SlotTennis(v, f, cancha, hora, f"https://bench/{v}/{cancha}")
+        for v in venues for f in fechas for cancha, hora in stub_server.slots_tennis(v, f)
+    ]
+
+def filas_golf(venues, fechas):
+    from registros import SlotGolf
+    return [
+        SlotGolf(v, f, hora, hoyos, libres, f"https://bench/{v}")
+        for v in venues for f in fechas for hoyos in (9, 18)
+        for hora, libres in stub_server.slots_golf(v, f, hoyos) if libres
+    ]
+
+def filas_kikoff(fechas):
+    from registros import SlotFutsal
+    from soccer_scrapper import KIKOFF_DURATION_IDS
+    return [
+        SlotFutsal("KIKOFF", f, t.strftime("%I:%M %p"), minutos, "N/A", "https://bench/kikoff")
+        for f in fechas
+        for minutos, appointment_id in KIKOFF_DURATION_IDS.items()
+        for t in stub_server.slots_kikoff(appointment_id, a_date(f))
+    ]
+
+def bloques_futsal(venues, fechas):
+    from intervalos import unir_bloques
+    from registros import BloqueLibre
+    return unir_bloques([
+        BloqueLibre(
+            v, f"Court {cancha}", a_date(f).strftime("%d-%m-%Y"),
+            stub_server._hora(ini).replace(" ", ""), stub_server._hora(fin).replace(" ", "")
+        )
+        for v in venues for f in fechas
+        for cancha, ini, fin in stub_server.slots_pittwater(a_date(f), v)
+    ])
+
+def tablas_bench(args):
+    """(tabla, crear, guardar, registros, kwargs de publicar_tabla) por cada tabla viva."""
+    import tennis_scrapper, golf_scrapper, soccer_scrapper
+    fechas = fechas_horizonte(28)
+    tennis_venues = [f"bench-tennis-{i}" for i in range(args.venues)]
+    golf_venues = [f"Bench Golf {i}" for i in range(args.venues)]
+    futsal_venues = [f"Bench Futsal {i}" for i in range(args.venues)]
+    return [
+        ("horarios", tennis_scrapper.crear_tabla_postgres, tennis_scrapper.guardar_slots_postgres,
+         filas_tennis(tennis_venues, fechas),
+         dict(claves=["venue", "fecha", "cancha", "hora"], valores=["link", "hora_bucket"],
+              indices=[("fecha", "venue", "hora_bucket")])),
+        ("golf_horarios", golf_scrapper.crear_tabla_golf_postgres, golf_scrapper.guardar_golf_postgres,
+         filas_golf(golf_venues, fechas),
+         dict(claves=["venue", "fecha", "hora", "hoyos"], valores=["lugares", "link", "hora_bucket"],
+              indices=[("fecha", "venue", "hora_bucket")])),
+        ("futsal_horarios", soccer_scrapper.crear_tabla_futsal, soccer_scrapper.guardar_futsal,
+         filas_kikoff(fechas),
+         dict(claves=["venue", "fecha", "hora", "court", "minutos"], valores=["link", "hora_bucket"],
+              indices=[("fecha", "venue", "hora_bucket")])),
+        ("futsal_intervalos", soccer_scrapper.crear_tabla_intervalos,
+         lambda intervalos: soccer_scrapper.guardar_intervalos(intervalos, "https://bench/futsal"),
+         bloques_futsal(futsal_venues, fechas),
+         dict(claves=["venue", "court", "fecha", "rango"], valores=["link"],
+              indices=[("fecha", "venue")], indices_gist=[("rango",)])),
+    ]
+
+def etapa_escritura(args):
+    from db_utils import publicar_tabla, staging, ESCRITOR
+
+    def guardar_y_esperar(guardar, tabla, datos):
+        # guardar_* sólo encola; se mide hasta que el escritor terminó el COPY
+        guardar(datos)
+        ESCRITOR.vaciar(staging(tabla))
+    print(f"\n── Escritura ({args.venues} venues x 28 días) ──")
+    print(f"{'tabla':<20}{'corrida':<12}{'filas':>9}{'guardar s':>11}{'filas/s':>11}{'publicar s':>12}")
+    for tabla, crear, guardar, registros, publicar_kwargs in tablas_bench(args):
+        alcance = {(r.venue, r.fecha) for r in registros}
+        corridas = [
+            ("inicial", registros),
+            ("sin cambios", registros),
+            ("-5%", random.Random(1).sample(registros, int(len(registros) * 0.95))),
+        ]
+        for nombre, datos in corridas:
+            crear()
+            t_guardar, _ = medir(guardar_y_esperar, guardar, tabla, datos)
+            t_publicar, _ = medir(publicar_tabla, tabla, alcance=alcance, **publicar_kwargs)
+            print(
+                f"{tabla:<20}{nombre:<12}{len(datos):>9}{t_guardar:>11.2f}"
+                f"{len(datos) / t_guardar if t_guardar else 0:>11.0f}{t_publicar:>12.2f}"
+            )
+        # Deja la tabla con la foto completa para la etapa de API
+        crear()
+        guardar(registros)
+        publicar_tabla(tabla, alcance=alcance, **publicar_kwargs)
+
+# ──────────────────────────────────────────────────────────────
+# Scrape: cada scraper contra el stub
+# ──────────────────────────────────────────────────────────────
+def scrape_tennis(args, fechas):
+    import tennis_scrapper
+    venues = [f"stub-tennis-{i}" for i in range(args.scrape_venues)]
+    asyncio.run(tennis_scrapper.scrapear_concurrente(venues, fechas, max_concurrent=args.concurrencia))
+    return len(venues) * len(fechas)
+
+def scrape_golf(args, fechas):
+    import golf_scrapper
+    courses = {
+        f"Stub Golf {i}": {"domain": f"club{i}.stub", "bookingResourceId": "3000000",
+                           "feeGroupIds": {"18": "1", "9": "2"}}
+        for i in range(args.scrape_venues)
+    }
+    dias = [a_date(f) for f in fechas]
+    golf_scrapper.scrape_days(dias, courses=courses)
+    return len(courses) * 2 * len(dias)
+
+def scrape_futsal(args, fechas):
+    import soccer_scrapper
+    asyncio.run(soccer_scrapper.scrapear(0, len(fechas)))
+    ventanas_kikoff = -(-len(fechas) // soccer_scrapper.KIKOFF_MAX_DAYS)
+    return len(fechas) + ventanas_kikoff * len(soccer_scrapper.KIKOFF_DURATION_IDS)
+
+SCRAPERS = {"tennis": scrape_tennis, "golf": scrape_golf, "futsal": scrape_futsal}
+
+def etapa_scrape(args):
+    fechas = fechas_horizonte(args.scrape_dias)
+    resultados = []
+    for fuente in args.fuentes.split(","):
+        for corrida in ("fría", "huellas"):
+            try:
+                segundos, paginas = medir(SCRAPERS[fuente], args, fechas)
+                resultados.append((fuente, corrida, paginas, segundos))
+            except Exception as e:
+                print(f"❌ Error scrapeando {fuente} contra el stub: {e}")
+                break
+    print(f"\n── Scrape contra el stub ({args.scrape_venues} venues x {args.scrape_dias} días) ──")
+    print(f"{'fuente':<10}{'corrida':<10}{'páginas':>9}{'segundos':>10}{'páginas/s':>11}")
+    for fuente, corrida, paginas, segundos in resultados:
+        print(f"{fuente:<10}{corrida:<10}{paginas:>9}{segundos:>10.2f}{paginas / segundos:>11.1f}")
+
+# ──────────────────────────────────────────────────────────────
+# API: latencia por endpoint
+# ──────────────────────────────────────────────────────────────
+def endpoints_api():
+    fechas = fechas_horizonte(28)
+    fecha = fechas[1]
+    return [
+        f"/disponibilidad_tennis?fecha={fecha}",
+        f"/disponibilidad_tennis?fecha={fecha}&venue=bench-tennis-1",
+        f"/disponibilidad_golf?fecha={fecha}&hoyos=18",
+        f"/disponibilidad_general?fecha={fecha}&hora_redondeada=07:00%20PM",
+        f"/disponibilidad_futsal?fecha={fecha}&minutos=60",
+        f"/disponibilidad_futsal?fecha={fecha}&minutos=90&hora=07:00%20PM&venue=Bench%20Futsal%201",
+        f"/disponibilidad_rango?fecha_desde={fechas[0]}&fecha_hasta={fechas[-1]}&venue=bench-tennis-1,Bench%20Golf%201",
+        f"/proxima_disponibilidad?fecha={fecha}&hora=07:00%20PM&k=10",
+        f"/proxima_disponibilidad?fecha={fecha}&hora=07:00%20PM&k=5&deporte=futsal&minutos=90",
+    ]
+
+def esperar_ready(url, timeout=60):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            with urllib.request.urlopen(f"{url}/ready", timeout=2) as r:
+                if r.status == 200:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise SystemExit("❌ La API no quedó lista.")
+
+def etapa_api(args):
+    url = f"http://127.0.0.1:{args.api_port}"
+    env = dict(os.environ, SNAPSHOT_ENABLED=args.snapshot, DB_ASYNC=args.db_async)
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.api_port), "--log-level", "warning"],
+        cwd=RAIZ, env=env
+    )
+    try:
+        esperar_ready(url)
+        if args.snapshot == "1":
+            time.sleep(10)  # primera carga del snapshot
+        print(f"\n── API (SNAPSHOT_ENABLED={args.snapshot} DB_ASYNC={args.db_async}) ──")
+        print(f"{'endpoint':<90}{'conc':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>5}")
+        for endpoint in endpoints_api():
+            for nivel in (int(n) for n in args.niveles.split(",")):
+                latencias, errores, duracion = correr_nivel([url + endpoint], nivel, args.requests)
+                if not latencias:
+                    print(f"{endpoint:<90}{nivel:>6}{'-':>9}{'-':>9}{'-':>9}{'-':>9}{errores:>5}")
+                    continue
+                print(
+                    f"{endpoint:<90}{nivel:>6}{len(latencias) / duracion:>9.1f}"
+                    f"{percentil(latencias, 50):>9.1f}{percentil(latencias, 95):>9.1f}"
+                    f"{percentil(latencias, 99):>9.1f}{errores:>5}"
+                )
+    finally:
+        api.terminate()
+        api.wait()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--etapas", default="escritura,scrape,api")
+    ap.add_argument("--venues", type=int, default=300, help="venues por tabla al sembrar")
+    ap.add_argument("--fuentes", default="tennis,golf,futsal")
+    ap.add_argument("--scrape-venues", type=int, default=50)
+    ap.add_argument("--scrape-dias", type=int, default=7)
+    ap.add_argument("--concurrencia", type=int, default=8)
+    ap.add_argument("--fixtures", default=None, help="páginas grabadas para el stub")
+    ap.add_argument("--api-port", type=int, default=8799)
+    ap.add_argument("--niveles", default="1,16,64")
+    ap.add_argument("--requests", type=int, default=300, help="requests por endpoint y nivel")
+    ap.add_argument("--snapshot", default="1")
+    ap.add_argument("--db-async", default="0")
+    args = ap.parse_args()
+
+    parar = None
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        url, parar = postgres_temporal()
+    os.environ["DATABASE_URL"] = url
+    servidor, base = stub_server.iniciar(fixtures=args.fixtures)
+    configurar_entorno(base)
+    etapas = args.etapas.split(",")
+    try:
+        if "escritura" in etapas:
+            etapa_escritura(args)
+        if "scrape" in etapas:
+            etapa_scrape(args)
+        if "api" in etapas:
+            etapa_api(args)
+    finally:
+        servidor.shutdown()
+        if parar:
+            parar()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark del parseo de timesheets de golf: parser original
+(BeautifulSoup + select + doble strptime) vs los backends de parser_golf, y
+throughput del pool de procesos. Verifica además que la salida sea idéntica
+en cada página.
+
+    python bench/bench_parser.py --paginas 200 --procesos 1,2,4
+    python bench/bench_parser.py --fixtures DIR   # suma DIR/golf.html y DIR/golf/*.html
+
+Las páginas son las del stub (bench/stub_server.py) más variantes con el
+ruido de una página real de MiClub (scripts, comentarios, celdas anidadas,
+filas sin hora, entidades) para ejercitar el extractor dirigido.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import stub_server
+from parser_golf import PARSERS, parsear_timesheet
+
+def parse_available_slots_viejo(html):
+    # Copia del parser original de golf_scrapper, como referencia
+    soup = BeautifulSoup(html, "html.parser")
+
+    slots = []
+    for row in soup.select("div.row-time"):
+        h3 = row.find("h3")
+        if not h3:
+            continue
+        try:
+            t_std = datetime.strptime(h3.get_text(strip=True), "%I:%M %p")
+        except ValueError:
+            continue
+        free = len(row.select("div.cell-available"))
+        if free:
+            slots.append((t_std.strftime("%I:%M %p"), free))
+    return sorted(slots, key=lambda x: datetime.strptime(x[0], "%I:%M %p"))
+
+def pagina_ruidosa(domain, fecha, fee_group):
+    """La página del stub envuelta en el markup que trae una real."""
+    filas = []
+    for i, (hora, libres) in enumerate(stub_server.slots_golf(domain, fecha, fee_group)):
+        celdas = ['<div class="cell cell-available"><span class="icon">+</span></div>'] * libres
+        celdas += [
+            '<div class="cell cell-booked"><div class="name">J. O&#39;Brien &amp; co</div></div>'
+        ] * (stub_server.JUGADORES_GOLF - libres)
+        titulo = f"<h3>\n  {hora.replace(' ', '&nbsp;') if i % 7 == 3 else hora}\n</h3>"
+        if i % 11 == 5:
+            titulo = f"<h3><span>{hora[:5]}</span> {hora[6:]}</h3>"
+        if i % 13 == 7:
+            titulo = "<h3>Closed</h3>"
+        if i % 17 == 9:
+            titulo = ""
+        clase = "'row row-time'" if i % 2 else '"row row-time even"'
+        filas.append(
+            f'<DIV class={clase} data-id="{i}"><div class="time-wrapper">{titulo}'
+            f'<!-- <div class="cell cell-available"></div> --></div>{"".join(celdas)}<br/></DIV>'
+        )
+    return (
+        "<!DOCTYPE html><html><head><title>Timesheet</title>"
+        "<script>var plantilla = '<div class=\"row row-time\"><h3>01:00 AM</h3>"
+        "<div class=\"cell-available\"></div></div>';</script>"
+        "<style>div.cell-available > span { color: green; }</style></head><body>"
+        "<div class='nav'><h3>Menu</h3><div class='cell-available'>no es fila</div></div>"
+        f"<div class='timesheet'>{''.join(filas)}</div>"
+        "<div class='footer'><div class='row-time-legend'><h3>07:00 AM</h3></div></div>"
+        "</body></html>"
+    )
+
+def paginas_bench(cantidad, fixtures=None):
+    hoy = date.today()
+    paginas = []
+    for i in range(cantidad):
+        fecha = (hoy + timedelta(days=i // 4)).isoformat()
+        fee_group = str(i % 2 + 1)
+        domain = f"club{i % 4}.com"
+        if i % 2:
+            paginas.append(pagina_ruidosa(domain, fecha, fee_group))
+        else:
+            paginas.append(stub_server.pagina_golf(domain, fecha, fee_group))
+    if fixtures:
+        carpeta = Path(fixtures)
+        archivos = [carpeta / "golf.html"] + sorted((carpeta / "golf").glob("*.html"))
+        paginas += [a.read_text() for a in archivos if a.exists()]
+    return paginas
+
+def medir(fn, paginas, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        out = [fn(html) for html in paginas]
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor, out
+
+def medir_pool(parser, paginas, procesos):
+    with ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Arranque de los procesos fuera de la medición, como en una corrida
+        list(pool.map(parsear_timesheet, paginas[:procesos], [parser] * procesos))
+        t0 = time.perf_counter()
+        list(pool.map(parsear_timesheet, paginas, [parser] * len(paginas)))
+        return time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--paginas", type=int, default=200)
+    ap.add_argument("--repeticiones", type=int, default=3)
+    ap.add_argument("--procesos", default="1,2,4", help="tamaños del pool a medir")
+    ap.add_argument("--fixtures", default=None, help="directorio con páginas grabadas")
+    args = ap.parse_args()
+
+    paginas = paginas_bench(args.paginas, args.fixtures)
+    t_viejo, viejo = medir(parse_available_slots_viejo, paginas, args.repeticiones)
+    filas_totales = sum(len(slots) for slots in viejo)
+    print(f"páginas: {len(paginas)}  slots: {filas_totales}")
+    print(f"{'parser':<20}{'ms/página':>10}{'páginas/s':>12}{'x':>7}  salida idéntica")
+    print(f"{'original':<20}{t_viejo / len(paginas) * 1000:>10.2f}{len(paginas) / t_viejo:>12.0f}{1:>7.1f}")
+
+    distintas = 0
+    for nombre, parser in PARSERS.items():
+        t, out = medir(parser, paginas, args.repeticiones)
+        malas = sum(a != b for a, b in zip(viejo, out))
+        distintas += malas
+        print(
+            f"{nombre:<20}{t / len(paginas) * 1000:>10.2f}{len(paginas) / t:>12.0f}"
+            f"{t_viejo / t:>7.1f}  {'sí' if not malas else f'NO ({malas} páginas)'}"
+        )
+
+    for procesos in [int(p) for p in args.procesos.split(",") if p]:
+        for nombre in PARSERS:
+            t = medir_pool(nombre, paginas, procesos)
+            print(f"{f'pool {procesos} x {nombre}':<20}{t / len(paginas) * 1000:>10.2f}{len(paginas) / t:>12.0f}{t_viejo / t:>7.1f}")
+
+    if distintas:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import numpy as np
+from intervalos import parser_bloques
+from registros import SlotFutsal
+
+# ──────────────────────────────────────────────────────────────
+# Motor de ticks (sólo benchmarks)
+#
+# Reemplazo vectorizado del viejo expand_consecutive_blocks: los bloques
+# libres se expanden a ticks con NumPy y la pregunta "¿están libres los N
+# ticks siguientes?" se responde con corridas de ticks consecutivos.
+# Producción ya no expande (guarda intervalos, intervalos.unir_bloques),
+# así que vive acá con bench_intervalos.py; numpy no está en requirements.
+# ──────────────────────────────────────────────────────────────
+
+# Horas del día ya formateadas (%I:%M %p), indexadas por minuto desde medianoche
+HORAS_FORMATEADAS = np.array([
+    f"{(m // 60) % 12 or 12:02d}:{m % 60:02d} {'AM' if m < 12 * 60 else 'PM'}"
+    for m in range(24 * 60)
+])
+
+def parsear_bloques(bloques):
+    """Listas de datetime de inicio y fin de cada bloque (fecha + hora_inicio/hora_fin)."""
+    parsear = parser_bloques()
+    start = [parsear(b.fecha, b.hora_inicio) for b in bloques]
+    end = [parsear(b.fecha, b.hora_fin) for b in bloques]
+    return start, end
+
+def formatear_ticks(ticks):
+    """(fecha %Y%m%d, hora %I:%M %p) de cada tick, formateando sólo valores únicos."""
+    dias = ticks.astype("datetime64[D]")
+    minutos = ((ticks - dias) // np.timedelta64(1, "m")).astype(np.int64)
+    dias_unicos, inverso = np.unique(dias, return_inverse=True)
+    fechas = np.array([d.strftime("%Y%m%d") for d in dias_unicos.astype(object)])[inverso]
+    return fechas, HORAS_FORMATEADAS[minutos]
+
+def expandir_ticks(bloques, tick_minutes=30):
+    """Ticks libres sin duplicados, ordenados por (venue, court, fecha, tick).
+    Devuelve (claves únicas, código de clave, tick, restantes) donde
+    `restantes` = cantidad de ticks libres consecutivos desde ese tick."""
+    tick = np.timedelta64(tick_minutes, "m")
+    start, end = parsear_bloques(bloques)
+    start = np.array(start, dtype="datetime64[m]")
+    end = np.array(end, dtype="datetime64[m]")
+    claves = sorted({(b.venue, b.court, b.fecha) for b in bloques})
+    codigo_de = {clave: i for i, clave in enumerate(claves)}
+    codigos = np.array([codigo_de[(b.venue, b.court, b.fecha)] for b in bloques], dtype=np.int64)
+
+    # Ticks t = start + k*tick con t + tick <= end
+    n = np.maximum((end - start) // tick, 0).astype(np.int64)
+    fila = np.repeat(np.arange(len(bloques)), n)
+    k = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    ticks = start[fila] + k * tick
+    codigo = codigos[fila]
+
+    # Sólo ticks de la misma "fase" (minuto mod tick) pueden encadenarse:
+    # t0 + k*tick nunca cae en un tick de otra fase
+    minuto = ticks.astype(np.int64)
+    fase = minuto % tick_minutes
+    orden = np.lexsort((minuto, fase, codigo))
+    codigo, fase, ticks, minuto = codigo[orden], fase[orden], ticks[orden], minuto[orden]
+    unico = np.ones(len(ticks), dtype=bool)
+    unico[1:] = (codigo[1:] != codigo[:-1]) | (minuto[1:] != minuto[:-1])
+    codigo, fase, ticks, minuto = codigo[unico], fase[unico], ticks[unico], minuto[unico]
+
+    nueva_corrida = np.ones(len(ticks), dtype=bool)
+    nueva_corrida[1:] = (
+        (codigo[1:] != codigo[:-1]) | (fase[1:] != fase[:-1]) | (minuto[1:] - minuto[:-1] != tick_minutes)
+    )
+    corrida = np.cumsum(nueva_corrida) - 1
+    # Último índice de cada corrida: restantes = ticks hasta el final de la suya
+    ultimos = np.flatnonzero(np.append(nueva_corrida[1:], True))
+    restantes = ultimos[corrida] - np.arange(len(ticks)) + 1
+
+    orden = np.lexsort((minuto, codigo))
+    return claves, codigo[orden], ticks[orden], restantes[orden]
+
+def expand_consecutive_blocks(bloques, tick_minutes=30, durations=(30, 60, 90, 120), link=None):
+    """Un SlotFutsal por inicio posible x duración que entra completa en los bloques libres."""
+    if not bloques:
+        return []
+    claves, codigo, ticks, restantes = expandir_ticks(bloques, tick_minutes)
+    fechas, horas = formatear_ticks(ticks)
+    necesarios = [(duration, duration // tick_minutes) for duration in durations]
+    return [
+        SlotFutsal(claves[c][0], fecha, hora, duration, claves[c][1], link)
+        for c, fecha, hora, r in zip(codigo.tolist(), fechas.tolist(), horas.tolist(), restantes.tolist())
+        for duration, n in necesarios if r >= n
+    ]
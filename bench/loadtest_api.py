@@ -0,0 +1,85 @@
+"""Load test de la API: curva de latencia (p50/p95/p99) vs concurrencia.
+
+Levantar la API en cada modo y correr el mismo script contra ambos, p.ej.:
+
+    SNAPSHOT_ENABLED=0 DB_ASYNC=0 uvicorn app:app --port 8000
+    python bench/loadtest_api.py --url http://localhost:8000 --fecha 20250528 --etiqueta sync
+
+    SNAPSHOT_ENABLED=0 DB_ASYNC=1 uvicorn app:app --port 8000
+    python bench/loadtest_api.py --url http://localhost:8000 --fecha 20250528 --etiqueta async
+
+(SNAPSHOT_ENABLED=0 para que todas las requests vayan a Postgres.)
+
+Medición de referencia (base sembrada por bench_offline, 300 venues; API,
+Postgres y este script en una sola CPU, con los defaults de --niveles y
+--requests). El throughput queda atado a esa CPU (~17 req/s en los dos
+modos), así que sólo cambia la forma de la cola; p99 en ms:
+
+    conc      1      8     32     64    128
+    sync    275    979   2736   5073   9851
+    async   166    747   2833   7627  21964   (1 error a 128)
+
+async baja la latencia con poca concurrencia pero, saturado, reparte peor
+la espera: la cola se estira más que con el threadpool. Hay que repetirlo
+con la base en otra máquina antes de sacar conclusiones de producción.
+"""
+import argparse
+import statistics
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = [
+    "/disponibilidad_tennis?fecha={fecha}",
+    "/disponibilidad_golf?fecha={fecha}",
+    "/disponibilidad_general?fecha={fecha}&hora_redondeada=07:00%20PM",
+]
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    k = max(0, min(len(valores) - 1, round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+def pedir(url):
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as r:
+            r.read()
+            ok = r.status == 200
+    except Exception:
+        ok = False
+    return time.perf_counter() - t0, ok
+
+def correr_nivel(urls, concurrencia, total):
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        t0 = time.perf_counter()
+        resultados = list(pool.map(pedir, (urls[i % len(urls)] for i in range(total))))
+        duracion = time.perf_counter() - t0
+    latencias = [lat * 1000 for lat, ok in resultados if ok]
+    errores = sum(1 for _, ok in resultados if not ok)
+    return latencias, errores, duracion
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--fecha", required=True)
+    ap.add_argument("--niveles", default="1,8,32,64,128")
+    ap.add_argument("--requests", type=int, default=500, help="requests por nivel")
+    ap.add_argument("--etiqueta", default="")
+    args = ap.parse_args()
+
+    urls = [args.url + e.format(fecha=args.fecha) for e in ENDPOINTS]
+    print(f"{'modo':<8}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for nivel in (int(n) for n in args.niveles.split(",")):
+        latencias, errores, duracion = correr_nivel(urls, nivel, args.requests)
+        if not latencias:
+            print(f"{args.etiqueta:<8}{nivel:>6}{'-':>10}{'-':>10}{'-':>10}{'-':>10}{errores:>9}")
+            continue
+        print(
+            f"{args.etiqueta:<8}{nivel:>6}{len(latencias) / duracion:>10.1f}"
+            f"{statistics.median(latencias):>10.1f}{percentil(latencias, 95):>10.1f}"
+            f"{percentil(latencias, 99):>10.1f}{errores:>9}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Stub HTTP local que imita a las cuatro fuentes con fixtures.
+
+Los fixtures reproducen el markup que leen los parsers (grilla TimeCell de
+tennisvenues, timesheet MiClub, JSON de Squarespace, página de YepBooking)
+y se generan de forma determinística por venue/fecha, así dos corridas ven
+las mismas páginas. Con --fixtures DIR se sirven páginas grabadas en lugar
+de las sintéticas (tennis.html, golf.html).
+
+    python bench/stub_server.py --port 8765
+
+Rutas (apuntar los scrapers con TENNIS_BASE_URL, GOLF_BASE_URL,
+KIKOFF_API_URL y PITTWATER_URL, ver bench_offline.py):
+
+    /tennis/booking/<venue>?date=YYYYMMDD
+    /golf/<domain>/guests/bookings/ViewPublicTimesheet.msp?selectedDate=YYYY-MM-DD&feeGroupId=N
+    /kikoff/availability/times?appointmentTypeId=N&startDate=YYYY-MM-DD&maxDays=N
+    /pittwater/                 (y /pittwater/dia?offset=N, que pide el botón de día siguiente)
+"""
+import argparse
+import json
+import random
+import threading
+import zlib
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, quote
+
+CANCHAS_TENNIS = 6
+CANCHAS_PITTWATER = 4
+JUGADORES_GOLF = 4
+
+def _rng(*partes):
+    return random.Random(zlib.crc32("|".join(map(str, partes)).encode()))
+
+def _hora(minutos):
+    return datetime(2000, 1, 1, minutos // 60, minutos % 60).strftime("%I:%M %p")
+
+# ──────────────────────────────────────────────────────────────
+# Slots sintéticos (también los usa bench_offline para sembrar la base)
+# ──────────────────────────────────────────────────────────────
+def slots_tennis(venue, fecha):
+    """[(cancha, hora)] libres: canchas x horas de 7am a 9pm."""
+    rng = _rng("tennis", venue, fecha)
+    return [
+        (str(cancha), _hora(h * 60))
+        for h in range(7, 22)
+        for cancha in range(1, CANCHAS_TENNIS + 1)
+        if rng.random() < 0.4
+    ]
+
+def slots_golf(domain, fecha, fee_group):
+    """[(hora, lugares libres)]: salidas cada 8 minutos de 6am a 4pm."""
+    rng = _rng("golf", domain, fecha, fee_group)
+    return [(_hora(m), rng.randint(0, JUGADORES_GOLF)) for m in range(6 * 60, 16 * 60, 8)]
+
+def slots_kikoff(appointment_id, dia):
+    """Inicios libres cada 15 minutos de 9am a 10pm."""
+    rng = _rng("kikoff", appointment_id, dia)
+    return [
+        datetime(dia.year, dia.month, dia.day, m // 60, m % 60)
+        for m in range(9 * 60, 22 * 60, 15)
+        if rng.random() < 0.3
+    ]
+
+def slots_pittwater(dia, venue="Pittwater RSL"):
+    """[(cancha, inicio, fin)] en minutos: bloques de media hora de 9am a 10pm."""
+    rng = _rng("pittwater", venue, dia)
+    return [
+        (cancha, m, m + 30)
+        for cancha in range(1, CANCHAS_PITTWATER + 1)
+        for m in range(9 * 60, 22 * 60, 30)
+        if rng.random() < 0.5
+    ]
+
+# ──────────────────────────────────────────────────────────────
+# Páginas
+# ──────────────────────────────────────────────────────────────
+def pagina_tennis(venue, fecha):
+    libres = set(slots_tennis(venue, fecha))
+    filas = []
+    for h in range(7, 22):
+        hora = _hora(h * 60)
+        celdas = []
+        for cancha in range(1, CANCHAS_TENNIS + 1):
+            if (str(cancha), hora) in libres:
+                href = f"/booking/{venue}/book?id={cancha}&date={fecha}&time={quote(hora)}"
+                celdas.append(f'<td class="TimeCell Available"><a href="{href}">{hora.lstrip("0").replace(" ", "").lower()}</a></td>')
+            else:
+                celdas.append('<td class="TimeCell Booked">Booked</td>')
+        filas.append(f"<tr><th>{hora}</th>{''.join(celdas)}</tr>")
+    return f"<html><body><h1>{venue}</h1><table class='BookingSheet'>{''.join(filas)}</table></body></html>"
+
+def pagina_golf(domain, fecha, fee_group):
+    filas = []
+    for hora, libres in slots_golf(domain, fecha, fee_group):
+        celdas = ['<div class="cell cell-available"></div>'] * libres
+        celdas += ['<div class="cell cell-booked">Member</div>'] * (JUGADORES_GOLF - libres)
+        filas.append(f'<div class="row row-time"><div class="time-wrapper"><h3>{hora}</h3></div>{"".join(celdas)}</div>')
+    return f"<html><body><div class='timesheet'>{''.join(filas)}</div></body></html>"
+
+def json_kikoff(appointment_id, desde, dias):
+    datos = {}
+    for i in range(dias):
+        dia = desde + timedelta(days=i)
+        datos[dia.isoformat()] = [
+            {"time": t.strftime("%Y-%m-%dT%H:%M:%S+1100"), "slotsAvailable": 1}
+            for t in slots_kikoff(appointment_id, dia)
+        ]
+    return datos
+
+def dia_pittwater(offset):
+    dia = date.today() + timedelta(days=offset)
+    slots = [
+        {"title": f"{_hora(ini).lstrip('0').replace(' ', '').lower()}–{_hora(fin).lstrip('0').replace(' ', '').lower()} - Available",
+         "lc": f"{cancha}|Futsal Court {cancha}"}
+        for cancha, ini, fin in slots_pittwater(dia)
+    ]
+    return {"titulo": dia.strftime("%A %d %B %Y"), "slots": slots}
+
+PAGINA_PITTWATER = """<html><body>
+<h3 id="titulo">%(titulo)s</h3><button id="nextDateMover">&gt;</button>
+<div id="grilla"></div>
+<script>
+let offset = 0;
+function pintar(d) {
+  document.getElementById("grilla").innerHTML = d.slots.map(
+    s => `<a class="empty" title="${s.title}" lc="${s.lc}">+</a>`).join("");
+  document.getElementById("titulo").innerText = d.titulo;
+}
+pintar(%(dia)s);
+document.getElementById("nextDateMover").onclick = async () => {
+  offset += 1;
+  pintar(await (await fetch("dia?offset=" + offset)).json());
+};
+</script></body></html>"""
+
+# ──────────────────────────────────────────────────────────────
+# Servidor
+# ──────────────────────────────────────────────────────────────
+class Stub(BaseHTTPRequestHandler):
+    grabadas = {}
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def responder(self, cuerpo, tipo="text/html"):
+        datos = cuerpo.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", f"{tipo}; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        partes = url.path.strip("/").split("/")
+        if partes[:2] == ["tennis", "booking"] and len(partes) == 3:
+            return self.responder(self.grabadas.get("tennis") or pagina_tennis(partes[2], q.get("date", "")))
+        if partes[0] == "golf" and len(partes) >= 2:
+            return self.responder(
+                self.grabadas.get("golf")
+                or pagina_golf(partes[1], q.get("selectedDate", ""), q.get("feeGroupId", ""))
+            )
+        if partes[0] == "kikoff":
+            desde = date.fromisoformat(q["startDate"])
+            datos = json_kikoff(q.get("appointmentTypeId", ""), desde, int(q.get("maxDays", "1")))
+            return self.responder(json.dumps(datos), "application/json")
+        if partes == ["pittwater", "dia"]:
+            return self.responder(json.dumps(dia_pittwater(int(q.get("offset", "0")))), "application/json")
+        if partes[0] == "pittwater":
+            dia = dia_pittwater(0)
+            return self.responder(PAGINA_PITTWATER % {"titulo": dia["titulo"], "dia": json.dumps(dia)})
+        self.send_error(404)
+
+def iniciar(port=0, fixtures=None):
+    """Levanta el stub en un thread. Devuelve (servidor, url base)."""
+    if fixtures:
+        for nombre in ("tennis", "golf"):
+            archivo = Path(fixtures) / f"{nombre}.html"
+            if archivo.exists():
+                Stub.grabadas[nombre] = archivo.read_text()
+    servidor = ThreadingHTTPServer(("127.0.0.1", port), Stub)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--fixtures", default=None, help="directorio con páginas grabadas")
+    args = ap.parse_args()
+    servidor, base = iniciar(args.port, args.fixtures)
+    print(f"Stub escuchando en {base}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+if __name__ == "__main__":
+    main()
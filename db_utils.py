@@ -0,0 +1,553 @@
+import os
+import io
+import csv
+import json
+import time
+import queue
+import asyncio
+import hashlib
+import threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from normalizacion import parsear_fecha
+from metricas import ESCRITURA_SEGUNDOS, PUBLICADAS, PAGINAS
+
+# ──────────────────────────────────────────────────────────────
+# Conexión compartida por los tres scrapers
+#
+# Un pool por proceso: el scheduler corre los tres scrapers juntos y cada
+# guardar/publicar toma una conexión prestada en vez de abrir una nueva.
+# ──────────────────────────────────────────────────────────────
+DB_POOL_MAX = int(os.getenv("SCRAPER_DB_POOL_MAX", "8"))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _pool_conexiones():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(1, DB_POOL_MAX, os.getenv("DATABASE_URL"))
+        return _pool
+
+@contextmanager
+def conexion():
+    """Conexión del pool; commit al salir bien, rollback si hubo error."""
+    pool = _pool_conexiones()
+    conn = pool.getconn()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
+
+def staging(tabla):
+    return f"{tabla}_staging"
+
+# ──────────────────────────────────────────────────────────────
+# Escritor de staging
+#
+# Un único hilo por proceso recibe filas por una cola y las vuelca con COPY
+# en lotes, sobre una conexión del pool que mantiene abierta. Los scrapers
+# encolan y siguen (sólo esperan si la cola está llena); publicar_tabla espera a
+# que se vacíe lo encolado para su tabla antes de mergear.
+#
+# Todo lo de este módulo bloquea (cola llena, vaciar, conexiones): desde una
+# corutina se usa escribir_async y el resto va por asyncio.to_thread, para no
+# frenar el event loop que comparten tennis y futsal en el scheduler.
+#
+# COPY no tiene ON CONFLICT: cada lote va a una tabla temporal y de ahí a
+# staging con INSERT ... ON CONFLICT DO NOTHING, como los inserts de antes.
+# ──────────────────────────────────────────────────────────────
+ESCRITOR_LOTE = int(os.getenv("ESCRITOR_LOTE", "5000"))
+# Tandas encoladas como máximo: si el COPY se atrasa, los scrapers esperan
+# en vez de acumular la corrida entera en memoria
+ESCRITOR_COLA = int(os.getenv("ESCRITOR_COLA", "64"))
+NULO = "\\N"
+
+def _csv(filas):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for fila in filas:
+        writer.writerow(NULO if v is None else v for v in fila)
+    buffer.seek(0)
+    return buffer
+
+def copiar_a_staging(conn, tabla_stg, columnas, filas):
+    """COPY de `filas` (tuplas en el orden de `columnas`) a `tabla_stg`."""
+    lote = f"{tabla_stg}_lote"
+    cols = ", ".join(columnas)
+    t0 = time.perf_counter()
+    with conn.cursor() as cur:
+        # Sin constraints: sólo las columnas que se copian
+        cur.execute(f"DROP TABLE IF EXISTS pg_temp.{lote}")
+        cur.execute(f"CREATE TEMP TABLE {lote} AS SELECT {cols} FROM {tabla_stg} WITH NO DATA")
+        cur.copy_expert(f"COPY {lote} ({cols}) FROM STDIN WITH (FORMAT csv, NULL '{NULO}')", _csv(filas))
+        cur.execute(f"INSERT INTO {tabla_stg} ({cols}) SELECT {cols} FROM {lote} ON CONFLICT DO NOTHING")
+        cur.execute(f"DROP TABLE {lote}")
+    ESCRITURA_SEGUNDOS.labels(tabla_stg.removesuffix("_staging"), "guardar").observe(time.perf_counter() - t0)
+
+class Escritor:
+    def __init__(self, lote=ESCRITOR_LOTE):
+        self.lote = lote
+        self.cola = queue.Queue(maxsize=ESCRITOR_COLA)
+        self.errores = {}
+        self._hilo = None
+        self._lock = threading.Lock()
+
+    def _iniciar(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._loop, daemon=True)
+                self._hilo.start()
+
+    def escribir(self, tabla_stg, columnas, filas):
+        """Encola filas para `tabla_stg`. Sólo bloquea si la cola está llena."""
+        if filas:
+            self._iniciar()
+            self.cola.put((tabla_stg, tuple(columnas), list(filas)))
+
+    async def escribir_async(self, tabla_stg, columnas, filas):
+        """escribir para corutinas: si la cola está llena espera en un thread,
+        no en el event loop."""
+        if filas:
+            self._iniciar()
+            carga = (tabla_stg, tuple(columnas), list(filas))
+            try:
+                self.cola.put_nowait(carga)
+            except queue.Full:
+                await asyncio.to_thread(self.cola.put, carga)
+
+    def vaciar(self, tabla_stg, ignorar_errores=False):
+        """Espera a que todo lo encolado para `tabla_stg` esté escrito."""
+        self._iniciar()
+        listo = threading.Event()
+        self.cola.put((tabla_stg, None, listo))
+        listo.wait()
+        error = self.errores.pop(tabla_stg, None)
+        if error is not None and not ignorar_errores:
+            raise RuntimeError(f"❌ Falló la escritura en {tabla_stg}: {error}")
+
+    def _volcar(self, conn, pendientes, tabla_stg=None):
+        """Escribe lo acumulado (de `tabla_stg`, o de todas). Devuelve la conexión."""
+        for clave in [c for c in pendientes if tabla_stg is None or c[0] == tabla_stg]:
+            tabla, columnas = clave
+            filas = pendientes.pop(clave)
+            try:
+                if conn is None or conn.closed:
+                    if conn is not None:
+                        _pool_conexiones().putconn(conn, close=True)
+                        conn = None
+                    conn = _pool_conexiones().getconn()
+                copiar_a_staging(conn, tabla, columnas, filas)
+                conn.commit()
+            except Exception as e:
+                if conn is not None and not conn.closed:
+                    conn.rollback()
+                print(f"❌ Error escribiendo {len(filas)} filas en {tabla}: {e}")
+                self.errores.setdefault(tabla, e)
+        return conn
+
+    def _loop(self):
+        pendientes = {}  # (tabla, columnas) -> filas
+        conn = None      # se mantiene abierta entre lotes
+        while True:
+            try:
+                tabla, columnas, carga = self.cola.get(timeout=0.5 if pendientes else None)
+            except queue.Empty:
+                # Cola quieta: se escribe lo acumulado aunque no llegue al lote
+                tabla, columnas, carga = None, None, None
+            if columnas is not None:
+                acumuladas = pendientes.setdefault((tabla, columnas), [])
+                acumuladas.extend(carga)
+                if len(acumuladas) < self.lote:
+                    continue
+            conn = self._volcar(conn, pendientes, tabla)
+            if columnas is None and carga is not None:
+                carga.set()  # barrera de vaciar()
+
+ESCRITOR = Escritor()
+
+# ──────────────────────────────────────────────────────────────
+# Staging + publicación incremental
+#
+# Cada corrida escribe en <tabla>_staging. Cuando termina, publicar_tabla
+# compara staging contra la tabla viva dentro del alcance scrapeado
+# (pares venue/fecha) y en una sola transacción inserta los slots nuevos,
+# actualiza los que cambiaron y borra los que desaparecieron. Las filas
+# iguales no se tocan, así que no hay tuplas muertas de más, y los lectores
+# ven la foto anterior completa hasta el commit.
+# ──────────────────────────────────────────────────────────────
+def crear_tabla_staging(tabla, columnas_sql):
+    # Filas de una corrida anterior que quedaron en la cola van a la staging
+    # vieja, no a la nueva
+    ESCRITOR.vaciar(staging(tabla), ignorar_errores=True)
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS generaciones (
+                    tabla TEXT PRIMARY KEY,
+                    generacion INTEGER NOT NULL,
+                    publicada TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS huellas (
+                    tabla TEXT NOT NULL,
+                    venue TEXT NOT NULL,
+                    fecha DATE NOT NULL,
+                    variante TEXT NOT NULL DEFAULT '',
+                    hash TEXT NOT NULL,
+                    vista TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    PRIMARY KEY (tabla, venue, fecha, variante)
+                )
+            """)
+            # La tabla viva tiene que existir siempre para que la API no devuelva 500
+            cur.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({columnas_sql})")
+            cur.execute(f"DROP TABLE IF EXISTS {staging(tabla)}")
+            cur.execute(f"CREATE UNLOGGED TABLE {staging(tabla)} ({columnas_sql})")
+
+def _esquema(cur, tabla):
+    cur.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_name = %s
+        ORDER BY ordinal_position
+    """, (tabla,))
+    return cur.fetchall()
+
+def _renombrar_dependencias(cur, tabla):
+    # Índices, constraints y secuencias conservan el nombre de staging tras un
+    # swap; los alineamos para que la próxima corrida no choque con ellos.
+    prefijo = staging(tabla)
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE i.indrelid = %s::regclass
+    """, (tabla,))
+    for (nombre,) in cur.fetchall():
+        if nombre.startswith(prefijo):
+            cur.execute(f"ALTER INDEX {nombre} RENAME TO {tabla}{nombre[len(prefijo):]}")
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_depend d JOIN pg_class c ON c.oid = d.objid
+        WHERE d.refobjid = %s::regclass AND c.relkind = 'S'
+    """, (tabla,))
+    for (nombre,) in cur.fetchall():
+        if nombre.startswith(prefijo):
+            cur.execute(f"ALTER SEQUENCE {nombre} RENAME TO {tabla}{nombre[len(prefijo):]}")
+
+def _tabla_alcance(cur, alcance):
+    """Tabla temporal `alcance` (venue, fecha) para filtrar con EXISTS."""
+    cur.execute("CREATE TEMP TABLE alcance (venue TEXT, fecha DATE) ON COMMIT DROP")
+    execute_values(
+        cur,
+        "INSERT INTO alcance (venue, fecha) VALUES %s",
+        list({(venue, parsear_fecha(fecha)) for venue, fecha in alcance})
+    )
+
+def _conservar_fuera_de_alcance(cur, tabla):
+    """Antes de un swap con alcance: copia a staging las filas vivas fuera del
+    alcance (columnas en común), para que el swap no borre las páginas sin
+    cambios ni los días de otros tramos. Devuelve cuántas copió, o None si
+    los esquemas no son compatibles (no se puede hacer el swap)."""
+    stg = staging(tabla)
+    tipos_vivos = dict(_esquema(cur, tabla))
+    comunes = [c for c, tipo in _esquema(cur, stg) if c != "id" and tipos_vivos.get(c) == tipo]
+    cols = ", ".join(comunes)
+    cur.execute("SAVEPOINT conservar")
+    try:
+        cur.execute(f"""
+            INSERT INTO {stg} ({cols})
+            SELECT {cols} FROM {tabla} t
+            WHERE NOT EXISTS (SELECT 1 FROM alcance a WHERE a.venue = t.venue AND a.fecha = t.fecha)
+            ON CONFLICT DO NOTHING
+        """)
+    except psycopg2.Error as e:
+        cur.execute("ROLLBACK TO SAVEPOINT conservar")
+        print(f"⚠️  No se pueden conservar las filas de {tabla} fuera del alcance: {e}")
+        return None
+    conservadas = cur.rowcount
+    cur.execute("RELEASE SAVEPOINT conservar")
+    return conservadas
+
+def _swap(cur, tabla):
+    stg = staging(tabla)
+    cur.execute(f"ALTER TABLE {stg} SET LOGGED")
+    cur.execute(f"ALTER TABLE IF EXISTS {tabla} RENAME TO {tabla}_old")
+    cur.execute(f"ALTER TABLE {stg} RENAME TO {tabla}")
+    cur.execute(f"DROP TABLE IF EXISTS {tabla}_old")
+    _renombrar_dependencias(cur, tabla)
+
+# ──────────────────────────────────────────────────────────────
+# Huellas por página
+#
+# Hash de la lista normalizada de slots de cada página (venue, fecha,
+# variante) de una tabla. Si la página vino igual que en la última corrida
+# publicada, el scraper no la escribe en staging, y la página
+# queda fuera del alcance de publicar_tabla: sus filas vivas no se tocan.
+# Las huellas nuevas se guardan en la misma transacción que la publicación.
+# ──────────────────────────────────────────────────────────────
+HUELLAS_ENABLED = os.getenv("HUELLAS_ENABLED", "1") == "1"
+HUELLAS_DIAS_ATRAS = 7
+
+def huella(filas):
+    """Hash estable de una lista de slots (dicts o registros), sin importar el orden."""
+    # Los registros se hashean como dict: mismas huellas que cuando eran filas de DataFrame
+    normalizadas = sorted(
+        json.dumps(f._asdict() if hasattr(f, "_asdict") else f, sort_keys=True, default=str)
+        for f in filas
+    )
+    return hashlib.sha1("\n".join(normalizadas).encode()).hexdigest()
+
+class Huellas:
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.previas = self._cargar() if HUELLAS_ENABLED else {}
+        self.nuevas = {}
+        self.sin_cambios = 0
+
+    def _cargar(self):
+        with conexion() as conn:
+            with conn.cursor() as cur:
+                # Con la tabla viva vacía (recién creada o migrada) las huellas
+                # no sirven: hay que escribir todo de nuevo. Lo mismo si el
+                # esquema cambió: publicar_tabla va a hacer un swap y las
+                # páginas sin cambios tienen que venir en staging
+                cur.execute(f"SELECT EXISTS (SELECT 1 FROM {self.tabla})")
+                if not cur.fetchone()[0] or _esquema(cur, self.tabla) != _esquema(cur, staging(self.tabla)):
+                    previas = {}
+                else:
+                    cur.execute(
+                        "SELECT venue, fecha, variante, hash FROM huellas WHERE tabla = %s",
+                        (self.tabla,)
+                    )
+                    previas = {(venue, fecha, variante): h for venue, fecha, variante, h in cur.fetchall()}
+        return previas
+
+    def cambio(self, venue, fecha, variante, filas):
+        """True si la página cambió desde la última publicación (hay que guardarla)."""
+        clave = (venue, parsear_fecha(fecha), variante)
+        h = huella(filas)
+        if self.previas.get(clave) == h:
+            self.sin_cambios += 1
+            PAGINAS.labels(self.tabla, "igual").inc()
+            return False
+        self.nuevas[clave] = h
+        PAGINAS.labels(self.tabla, "cambio").inc()
+        return True
+
+    def alcance(self):
+        """Pares (venue, fecha) de las páginas que cambiaron."""
+        return {(venue, fecha) for venue, fecha, _ in self.nuevas}
+
+    def guardar(self, cur):
+        if self.nuevas:
+            execute_values(
+                cur,
+                """
+                INSERT INTO huellas (tabla, venue, fecha, variante, hash) VALUES %s
+                ON CONFLICT (tabla, venue, fecha, variante) DO UPDATE
+                SET hash = EXCLUDED.hash, vista = now()
+                """,
+                [(self.tabla, venue, fecha, variante, h) for (venue, fecha, variante), h in self.nuevas.items()]
+            )
+        cur.execute(
+            "DELETE FROM huellas WHERE tabla = %s AND fecha < current_date - %s",
+            (self.tabla, HUELLAS_DIAS_ATRAS)
+        )
+
+# ──────────────────────────────────────────────────────────────
+# Eventos de disponibilidad (LISTEN/NOTIFY)
+#
+# publicar_tabla es el único lugar donde se sabe qué slots aparecieron,
+# desaparecieron o cambiaron: el merge los devuelve con RETURNING ya en el
+# formato de la API y se mandan con pg_notify en la misma transacción, así
+# que los oyentes los reciben recién al commit y nunca ven un merge a
+# medias. Un payload de NOTIFY no puede pasar de 8000 bytes: los slots van
+# en tandas. Si una publicación toca demasiados slots (primera corrida,
+# migración) se manda un único "recargar" en su lugar.
+# ──────────────────────────────────────────────────────────────
+EVENTOS_ENABLED = os.getenv("EVENTOS_ENABLED", "1") == "1"
+EVENTOS_CANAL = os.getenv("EVENTOS_CANAL", "disponibilidad")
+EVENTOS_MAX = int(os.getenv("EVENTOS_MAX", "5000"))
+EVENTOS_PAYLOAD_MAX = 7500
+
+def _json_slot(columnas, alias):
+    """RETURNING con el slot como JSON, fecha/hora formateadas como la API."""
+    pares = []
+    for c in columnas:
+        if c == "fecha":
+            pares.append(f"'fecha', to_char({alias}.fecha, 'YYYYMMDD')")
+        elif c == "hora":
+            pares.append(f"'hora', to_char({alias}.hora, 'HH12:MI AM')")
+        elif c == "hora_bucket":
+            pares.append(f"'hora_redondeada', to_char({alias}.hora_bucket, 'HH12:MI AM')")
+        else:
+            pares.append(f"'{c}', {alias}.{c}")
+    return f"RETURNING json_build_object({', '.join(pares)})::text"
+
+class Eventos:
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.slots = {"aparecio": [], "desaparecio": [], "cambio": []}
+        self.recargar = False
+
+    def agregar(self, tipo, filas):
+        self.slots[tipo].extend(json_slot for (json_slot,) in filas)
+
+    def _mensajes(self, generacion):
+        cabecera = f'{{"tabla": {json.dumps(self.tabla)}, "generacion": {json.dumps(generacion)}, '
+        if self.recargar or sum(map(len, self.slots.values())) > EVENTOS_MAX:
+            yield cabecera + '"tipo": "recargar", "slots": []}'
+            return
+        for tipo, slots in self.slots.items():
+            tanda, largo = [], 0
+            for slot in slots:
+                if tanda and largo + len(slot) > EVENTOS_PAYLOAD_MAX:
+                    yield cabecera + f'"tipo": "{tipo}", "slots": [{", ".join(tanda)}]}}'
+                    tanda, largo = [], 0
+                tanda.append(slot)
+                largo += len(slot) + 2
+            if tanda:
+                yield cabecera + f'"tipo": "{tipo}", "slots": [{", ".join(tanda)}]}}'
+
+    def enviar(self, cur, generacion):
+        for mensaje in self._mensajes(generacion):
+            cur.execute("SELECT pg_notify(%s, %s)", (EVENTOS_CANAL, mensaje))
+
+def publicar_tabla(tabla, claves, valores, alcance=None, indices=(), indices_gist=(), huellas=None):
+    """Mergea <tabla>_staging en <tabla>.
+
+    `claves` identifican un slot, `valores` son las columnas que pueden cambiar
+    sin que cambie el slot. `alcance` es la lista de pares (venue, fecha) que
+    se scrapearon en esta corrida; sólo ahí se borran slots desaparecidos.
+    Con alcance=None se toma la tabla entera. `indices` son listas de columnas
+    a indexar (btree) en la tabla viva, `indices_gist` lo mismo con GiST
+    (rangos). `huellas` (Huellas) se persisten junto con la publicación.
+    Devuelve los conteos.
+
+    Si el esquema de staging no coincide con el de la tabla viva (migración),
+    se reemplaza la tabla entera con un swap por rename. Con alcance, las
+    filas vivas de fuera del alcance se copian antes a staging; si no se
+    puede (tipos incompatibles, columnas NOT NULL nuevas) no se publica.
+    """
+    stg = staging(tabla)
+    columnas = claves + valores
+    mismo_slot = " AND ".join(f"s.{c} = t.{c}" for c in claves)
+    conteos = {"insertadas": 0, "actualizadas": 0, "borradas": 0}
+    eventos = Eventos(tabla) if EVENTOS_ENABLED else None
+    # Lo que los scrapers encolaron tiene que estar en staging antes de mergear
+    ESCRITOR.vaciar(stg)
+    t0 = time.perf_counter()
+    generacion = None
+    sin_swap = False
+    with conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {stg}")
+            filas = cur.fetchone()[0]
+            # Sin alcance, una corrida sin datos (sitio caído, bloqueo) no pisa
+            # la foto vigente. Con alcance los scrapers sólo pasan páginas que
+            # leyeron bien, así que un staging vacío es un día sin slots.
+            publicar = filas > 0 or bool(alcance)
+            if publicar and _esquema(cur, tabla) != _esquema(cur, stg):
+                conservadas = 0
+                if filas > 0 and alcance is not None:
+                    # Staging sólo tiene las páginas de este alcance: lo demás
+                    # de la tabla viva pasa a staging antes del swap
+                    _tabla_alcance(cur, alcance)
+                    conservadas = _conservar_fuera_de_alcance(cur, tabla)
+                if filas > 0 and conservadas is not None:
+                    print(f"⚠️  Esquema de {tabla} cambió, se reemplaza la tabla completa.")
+                    cur.execute(f"SELECT count(*) FROM {tabla}")
+                    conteos["borradas"] = cur.fetchone()[0] - conservadas
+                    conteos["insertadas"] = filas
+                    _swap(cur, tabla)
+                    if eventos:
+                        eventos.recargar = True
+                    # Las filas conservadas tienen el esquema viejo (columnas
+                    # nuevas en NULL): que la próxima corrida las reescriba
+                    cur.execute("DELETE FROM huellas WHERE tabla = %s", (tabla,))
+                else:
+                    publicar = False
+                    sin_swap = filas > 0
+            elif publicar:
+                filtro_alcance = ""
+                if alcance is not None:
+                    _tabla_alcance(cur, alcance)
+                    filtro_alcance = (
+                        "AND EXISTS (SELECT 1 FROM alcance a "
+                        "WHERE a.venue = t.venue AND a.fecha = t.fecha)"
+                    )
+                cur.execute(f"""
+                    DELETE FROM {tabla} t
+                    WHERE NOT EXISTS (SELECT 1 FROM {stg} s WHERE {mismo_slot})
+                    {filtro_alcance}
+                    {_json_slot(columnas, "t") if eventos else ""}
+                """)
+                conteos["borradas"] = cur.rowcount
+                if eventos:
+                    eventos.agregar("desaparecio", cur.fetchall())
+                if valores:
+                    cur.execute(f"""
+                        UPDATE {tabla} t
+                        SET {", ".join(f"{c} = s.{c}" for c in valores)}
+                        FROM {stg} s
+                        WHERE {mismo_slot}
+                        AND ROW({", ".join(f"t.{c}" for c in valores)})
+                            IS DISTINCT FROM ROW({", ".join(f"s.{c}" for c in valores)})
+                        {_json_slot(columnas, "t") if eventos else ""}
+                    """)
+                    conteos["actualizadas"] = cur.rowcount
+                    if eventos:
+                        eventos.agregar("cambio", cur.fetchall())
+                cur.execute(f"""
+                    INSERT INTO {tabla} ({", ".join(columnas)})
+                    SELECT {", ".join(f"s.{c}" for c in columnas)}
+                    FROM {stg} s
+                    WHERE NOT EXISTS (SELECT 1 FROM {tabla} t WHERE {mismo_slot})
+                    {_json_slot(columnas, tabla) if eventos else ""}
+                """)
+                conteos["insertadas"] = cur.rowcount
+                if eventos:
+                    eventos.agregar("aparecio", cur.fetchall())
+                cur.execute(f"DROP TABLE {stg}")
+            if publicar:
+                if huellas is not None:
+                    huellas.guardar(cur)
+                for cols in indices:
+                    nombre = f"{tabla}_{'_'.join(cols)}_idx"
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({', '.join(cols)})")
+                for cols in indices_gist:
+                    nombre = f"{tabla}_{'_'.join(cols)}_gist"
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} USING gist ({', '.join(cols)})")
+            if any(conteos.values()):
+                cur.execute("""
+                    INSERT INTO generaciones (tabla, generacion) VALUES (%s, 1)
+                    ON CONFLICT (tabla) DO UPDATE
+                    SET generacion = generaciones.generacion + 1, publicada = now()
+                    RETURNING generacion
+                """, (tabla,))
+                generacion = cur.fetchone()[0]
+                if eventos:
+                    eventos.enviar(cur, generacion)
+    ESCRITURA_SEGUNDOS.labels(tabla, "publicar").observe(time.perf_counter() - t0)
+    for tipo, n in conteos.items():
+        PUBLICADAS.labels(tabla, tipo).inc(n)
+    if not publicar and huellas is not None and huellas.sin_cambios:
+        print(f"{tabla} sin cambios ({huellas.sin_cambios} páginas iguales a la última corrida).")
+    elif sin_swap:
+        print(f"⚠️  Esquema de {tabla} cambió pero no se puede hacer el swap, se mantiene la versión publicada.")
+    elif not publicar:
+        print(f"⚠️  {stg} vacía, se mantiene la versión publicada de {tabla}.")
+    else:
+        print(
+            f"Publicada {tabla}: +{conteos['insertadas']} "
+            f"~{conteos['actualizadas']} -{conteos['borradas']} "
+            f"(generación {generacion if generacion is not None else 'sin cambios'})"
+            + (f", {huellas.sin_cambios} páginas sin cambios" if huellas is not None else "")
+        )
+    conteos["generacion"] = generacion
+    return conteos
@@ -0,0 +1,78 @@
+from sqlalchemy import MetaData, Table, Column, Integer, Text, Date, Time, DateTime, inspect
+from sqlalchemy.dialects.postgresql import TSRANGE
+
+# ──────────────────────────────────────────────────────────────
+# Definición de las tablas que lee la API
+#
+# Declaradas acá en vez de reflejadas al importar: un worker arranca sin
+# tocar Postgres. Tienen que coincidir con el DDL de crear_tabla_* en cada
+# scraper; verificar_esquema lo chequea contra la base.
+# ──────────────────────────────────────────────────────────────
+metadata = MetaData()
+
+horarios = Table(
+    "horarios", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("venue", Text),
+    Column("fecha", Date),
+    Column("cancha", Text),
+    Column("hora", Time),
+    Column("link", Text),
+    Column("hora_bucket", Time),
+)
+
+golf_horarios = Table(
+    "golf_horarios", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("venue", Text),
+    Column("fecha", Date),
+    Column("hora", Time),
+    Column("hoyos", Integer),
+    Column("lugares", Integer),
+    Column("link", Text),
+    Column("hora_bucket", Time),
+)
+
+futsal_horarios = Table(
+    "futsal_horarios", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("venue", Text),
+    Column("fecha", Date),
+    Column("hora", Time),
+    Column("minutos", Integer),
+    Column("court", Text),
+    Column("link", Text),
+    Column("hora_bucket", Time),
+)
+
+futsal_intervalos = Table(
+    "futsal_intervalos", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("venue", Text),
+    Column("court", Text),
+    Column("fecha", Date),
+    Column("rango", TSRANGE),
+    Column("link", Text),
+)
+
+generaciones = Table(
+    "generaciones", metadata,
+    Column("tabla", Text, primary_key=True),
+    Column("generacion", Integer),
+    Column("publicada", DateTime(timezone=True)),
+)
+
+def verificar_esquema(conn, tablas):
+    """Devuelve la lista de problemas (tablas o columnas faltantes). Vacía = OK."""
+    inspector = inspect(conn)
+    problemas = []
+    existentes = set(inspector.get_table_names())
+    for tabla in tablas:
+        if tabla.name not in existentes:
+            problemas.append(f"falta la tabla {tabla.name}")
+            continue
+        columnas = {c["name"] for c in inspector.get_columns(tabla.name)}
+        for c in tabla.c:
+            if c.name not in columnas:
+                problemas.append(f"falta la columna {tabla.name}.{c.name}")
+    return problemas
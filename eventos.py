@@ -0,0 +1,127 @@
+import asyncio
+import json
+import select
+import threading
+import time
+import psycopg2
+from metricas import API_SUSCRIPCIONES
+
+# ──────────────────────────────────────────────────────────────
+# Oyente de eventos de disponibilidad
+#
+# Una sola conexión LISTEN por proceso de la API, en un hilo propio, que
+# reparte cada NOTIFY de publicar_tabla (db_utils.Eventos) a las
+# suscripciones abiertas. Cada suscripción vive en el event loop con una
+# cola acotada: si un cliente lento la llena, se vacía y recibe "recargar"
+# para que vuelva a pedir la foto completa. Lo mismo cuando se cae la
+# conexión LISTEN, porque lo publicado en el medio se perdió.
+# ──────────────────────────────────────────────────────────────
+DEPORTES = {
+    "horarios": "tennis",
+    "golf_horarios": "golf",
+    "futsal_horarios": "futsal",
+    "futsal_intervalos": "futsal",
+}
+
+def recargar(tabla=None, generacion=None):
+    return {"tabla": tabla, "generacion": generacion, "tipo": "recargar", "slots": []}
+
+class Suscripcion:
+    def __init__(self, loop, deportes=None, venues=None, fechas=None, maximo=1000):
+        self.loop = loop
+        self.deportes = deportes
+        self.venues = venues
+        self.fechas = fechas
+        self.cola = asyncio.Queue(maxsize=maximo)
+
+    def recibir(self, mensaje):
+        # Corre en el event loop (call_soon_threadsafe desde el oyente)
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(recargar())
+
+    def filtrar(self, mensaje):
+        """El mensaje con sólo los slots que pidió el cliente, o None."""
+        deporte = DEPORTES.get(mensaje["tabla"])
+        if mensaje["tabla"] is not None and self.deportes and deporte not in self.deportes:
+            return None
+        if mensaje["tipo"] == "recargar":
+            return dict(mensaje, deporte=deporte)
+        slots = [
+            s for s in mensaje["slots"]
+            if (not self.venues or s.get("venue") in self.venues)
+            and (not self.fechas or s.get("fecha") in self.fechas)
+        ]
+        if not slots:
+            return None
+        return dict(mensaje, deporte=deporte, slots=slots)
+
+class Oyente:
+    def __init__(self, dsn, canal, reintento=5):
+        self.dsn = dsn
+        self.canal = canal
+        self.reintento = reintento
+        self.suscripciones = set()
+        self._hilo = None
+
+    def suscribir(self, **filtros):
+        sub = Suscripcion(asyncio.get_running_loop(), **filtros)
+        self.suscripciones.add(sub)
+        API_SUSCRIPCIONES.inc()
+        return sub
+
+    def desuscribir(self, sub):
+        if sub in self.suscripciones:
+            self.suscripciones.discard(sub)
+            API_SUSCRIPCIONES.dec()
+
+    def _repartir(self, mensaje):
+        for sub in list(self.suscripciones):
+            try:
+                sub.loop.call_soon_threadsafe(sub.recibir, mensaje)
+            except RuntimeError:
+                # Event loop cerrado (shutdown)
+                self.desuscribir(sub)
+
+    def _escuchar(self, reconexion):
+        conn = psycopg2.connect(self.dsn)
+        try:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.canal}")
+            print(f"Escuchando eventos en el canal {self.canal}")
+            if reconexion:
+                self._repartir(recargar())
+            while True:
+                if select.select([conn], [], [], 30) == ([], [], []):
+                    # Sin eventos: un ping para enterarse si la conexión murió
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        self._repartir(json.loads(notify.payload))
+                    except ValueError:
+                        print(f"⚠️  Evento ilegible en {self.canal}: {notify.payload[:200]}")
+        finally:
+            conn.close()
+
+    def _loop(self):
+        reconexion = False
+        while True:
+            try:
+                self._escuchar(reconexion)
+            except Exception as e:
+                print(f"❌ Error escuchando eventos: {e}")
+            reconexion = True
+            time.sleep(self.reintento)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._loop, daemon=True)
+            self._hilo.start()
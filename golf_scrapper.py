@@ -1,120 +1,236 @@
-import json, os, sys, requests
+import json, os, requests, threading
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from datetime import datetime, date, timedelta
-from typing import List, Tuple
-from bs4 import BeautifulSoup
-import pandas as pd
-import psycopg2
-from psycopg2.extras import execute_values
+from datetime import date, timedelta
+from typing import Iterator, List, Optional, Tuple
+from db_utils import crear_tabla_staging, publicar_tabla, staging, Huellas, ESCRITOR, ESCRITOR_LOTE
+from normalizacion import filas_tipadas, ahora_venues, dias_horizonte
+from registros import SlotGolf, en_lotes
+from metricas import PARSE_SEGUNDOS, FILAS, FALLAS
+from parser_golf import parsear_timesheet, GOLF_PARSER
+import limitador
 import warnings
 warnings.filterwarnings("ignore")
 
 HEADERS = {"User-Agent": "tee-watcher/1.0"}
 
-def get_conn():
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    return psycopg2.connect(DATABASE_URL)
+# Concurrencia del fetch: requests simultáneos por dominio MiClub
+MAX_PER_HOST = int(os.getenv("GOLF_MAX_PER_HOST", "4"))
+# Tasa inicial por dominio (req/s); el limitador la adapta según las respuestas
+GOLF_RPS = float(os.getenv("GOLF_RPS", "4"))
+# Base de cada timesheet; {domain} es el dominio MiClub del club
+GOLF_BASE_URL = os.getenv("GOLF_BASE_URL", "https://{domain}")
+# Procesos que parsean los timesheets, aparte de los threads del fetch; por
+# defecto uno por core menos el del fetch. 0 = parsear en el mismo thread
+# que bajó la página (con un solo core el pool no gana nada)
+GOLF_PARSE_PROCESOS = int(os.getenv("GOLF_PARSE_PROCESOS", str(min(4, (os.cpu_count() or 1) - 1))))
+# Corridas con menos páginas que esto (el tramo cerca son ~40) se parsean en
+# el thread del fetch: no compensan mandar el HTML a otro proceso
+GOLF_PARSE_MIN_PAGINAS = int(os.getenv("GOLF_PARSE_MIN_PAGINAS", "100"))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+_pool_parseo = None
+_pool_parseo_lock = threading.Lock()
 
 def crear_tabla_golf_postgres():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DROP TABLE IF EXISTS golf_horarios;")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS golf_horarios (
-            id SERIAL PRIMARY KEY,
-            venue TEXT,
-            fecha TEXT,
-            hora TEXT,
-            hoyos INTEGER,
-            lugares INTEGER,
-            link TEXT,
-            UNIQUE(venue, fecha, hora, hoyos)
-        )
+    crear_tabla_staging("golf_horarios", """
+        id SERIAL PRIMARY KEY,
+        venue TEXT,
+        fecha DATE,
+        hora TIME,
+        hoyos INTEGER,
+        lugares INTEGER,
+        link TEXT,
+        hora_bucket TIME,
+        UNIQUE(venue, fecha, hora, hoyos)
     """)
-    conn.commit()
-    cur.close()
-    conn.close()
 
-def guardar_golf_df_postgres(df):
-    if df.empty:
-        return
-    conn = get_conn()
-    with conn:
-        with conn.cursor() as cur:
-            venues = df['venue'].unique()
-            fechas = df['fecha'].unique()
-            for venue in venues:
-                for fecha in fechas:
-                    cur.execute("DELETE FROM golf_horarios WHERE venue=%s AND fecha=%s", (venue, fecha))
-            rows = list(df[['venue', 'fecha', 'hora', 'hoyos', 'lugares', 'link']].itertuples(index=False, name=None))
-            execute_values(
-                cur,
-                "INSERT INTO golf_horarios (venue, fecha, hora, hoyos, lugares, link) VALUES %s ON CONFLICT DO NOTHING",
-                rows
-            )
-    conn.close()
-
-def extract_available_slots(url: str) -> List[Tuple[str, int]]:
-    html = requests.get(url, headers=HEADERS, timeout=10).text
-    soup = BeautifulSoup(html, "html.parser")
-
-    slots = []
-    for row in soup.select("div.row-time"):
-        h3 = row.find("h3")
-        if not h3:
-            continue
-        try:
-            t_std = datetime.strptime(h3.get_text(strip=True), "%I:%M %p")
-        except ValueError:
-            continue
-        free = len(row.select("div.cell-available"))
-        if free:
-            slots.append((t_std.strftime("%I:%M %p"), free))
-    return sorted(slots, key=lambda x: datetime.strptime(x[0], "%I:%M %p"))
+def guardar_golf_postgres(slots):
+    for lote in en_lotes(slots, ESCRITOR_LOTE):
+        rows = filas_tipadas(lote, idx_fecha=1, idx_hora=2)
+        ESCRITOR.escribir(staging("golf_horarios"), SlotGolf._fields + ('hora_bucket',), rows)
+
+def get_session(domain: str, pool_size: int = MAX_PER_HOST) -> requests.Session:
+    """Sesión keep-alive por dominio, compartida entre threads."""
+    with _sessions_lock:
+        session = _sessions.get(domain)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[domain] = session
+        return session
+
+def descargar_timesheet(url: str, session: requests.Session = None) -> str:
+    return limitador.get(session or requests, url, GOLF_RPS, "golf", headers=HEADERS, timeout=10).text
+
+def pool_parseo(procesos: int = GOLF_PARSE_PROCESOS) -> Optional[ProcessPoolExecutor]:
+    """Pool de procesos para el parseo, uno solo por proceso y reusado entre
+    corridas; None si procesos=0. spawn y no fork: el proceso ya tiene
+    threads (fetch, ESCRITOR) y el pool de conexiones. Cada hijo spawn
+    re-importa el __main__ del padre (bajo el scheduler eso trae playwright,
+    psycopg2, etc.), así que el arranque se paga una vez y no por corrida."""
+    global _pool_parseo
+    if procesos <= 0:
+        return None
+    with _pool_parseo_lock:
+        if _pool_parseo is None:
+            _pool_parseo = ProcessPoolExecutor(procesos, mp_context=multiprocessing.get_context("spawn"))
+        return _pool_parseo
+
+def descartar_pool_parseo(pool: ProcessPoolExecutor):
+    """Saca del medio un pool roto (murió un hijo); la próxima corrida arma otro."""
+    global _pool_parseo
+    with _pool_parseo_lock:
+        if _pool_parseo is not pool:
+            return
+        _pool_parseo = None
+    print("⚠️  Pool de parseo de golf roto, lo que falta se parsea en el thread")
+    pool.shutdown(wait=False)
 
 def next_n_full_weeks(n: int = 3) -> List[date]:
-    today = date.today()
+    today = ahora_venues().date()
     monday = today - timedelta(days=today.weekday())
     days = []
     for i in range(n * 7):
         days.append(monday + timedelta(days=i))
     return days
 
-def main():
-    course_path = Path(__file__).parent / "venues" / "golf_venues.json"
-    try:
-        COURSES = json.loads(course_path.read_text())
-    except Exception as e:
-        raise RuntimeError(f"❌ Could not load {course_path}: {e}")
-
-    crear_tabla_golf_postgres()
-    results = []
-    for dia in next_n_full_weeks(4):
+def build_jobs(courses: dict, dias: List[date]) -> List[dict]:
+    jobs = []
+    for dia in dias:
         date_iso = dia.isoformat()
         fecha_fmt = dia.strftime("%Y%m%d")
-        for club, data in COURSES.items():
+        for club, data in courses.items():
             domain = data["domain"]
             booking_id = data["bookingResourceId"]
             fee_groups = data["feeGroupIds"]
             for hoyos_str, fee_id in fee_groups.items():
                 url = (
-                    f"https://{domain}/guests/bookings/ViewPublicTimesheet.msp"
+                    f"{GOLF_BASE_URL.format(domain=domain)}/guests/bookings/ViewPublicTimesheet.msp"
                     f"?bookingResourceId={booking_id}&selectedDate={date_iso}&feeGroupId={fee_id}"
                 )
-                for time_str, free in extract_available_slots(url):
-                    results.append({
-                        "venue": club,
-                        "fecha": fecha_fmt,
-                        "hora": time_str,
-                        "hoyos": int(hoyos_str),
-                        "lugares": free,
-                        "link": url
-                    })
-
-    df = pd.DataFrame(results)
-    print(df)
-    guardar_golf_df_postgres(df)
-    return df
+                jobs.append({
+                    "venue": club,
+                    "domain": domain,
+                    "fecha": fecha_fmt,
+                    "hoyos": int(hoyos_str),
+                    "url": url
+                })
+    return jobs
+
+def fetch_all_slots(
+    jobs: List[dict], max_per_host: int = MAX_PER_HOST, procesos: int = GOLF_PARSE_PROCESOS
+) -> Iterator[Tuple[dict, Optional[List[SlotGolf]]]]:
+    """Baja todos los timesheets en paralelo, con a lo sumo `max_per_host`
+    requests en vuelo por dominio sobre conexiones keep-alive, y los parsea
+    en el pool de `procesos` procesos (o en el mismo thread si son menos de
+    GOLF_PARSE_MIN_PAGINAS páginas).
+    Genera (job, slots) a medida que terminan; slots None si el job falló."""
+    host_sems = {}
+    for job in jobs:
+        host_sems.setdefault(job["domain"], threading.BoundedSemaphore(max_per_host))
+
+    def fetch(job, parse_pool):
+        try:
+            with host_sems[job["domain"]]:
+                html = descargar_timesheet(job["url"], get_session(job["domain"], max_per_host))
+            # El cupo del host ya se liberó: mientras esta página se parsea
+            # en otro proceso, otro thread baja la siguiente
+            slots = None
+            if parse_pool is not None:
+                try:
+                    slots, segundos = parse_pool.submit(parsear_timesheet, html, GOLF_PARSER).result()
+                except BrokenProcessPool:
+                    descartar_pool_parseo(parse_pool)
+            if slots is None:
+                slots, segundos = parsear_timesheet(html, GOLF_PARSER)
+        except Exception as e:
+            print(f"❌ Error en {job['venue']}-{job['fecha']}-{job['hoyos']}: {e}")
+            FALLAS.labels("golf", job["venue"]).inc()
+            return None
+        PARSE_SEGUNDOS.labels("golf").observe(segundos)
+        FILAS.labels("golf", job["venue"]).inc(len(slots))
+        return [
+            SlotGolf(job["venue"], job["fecha"], time_str, job["hoyos"], free, job["url"])
+            for time_str, free in slots
+        ]
+
+    if not jobs:
+        return
+    parse_pool = pool_parseo(procesos) if len(jobs) >= GOLF_PARSE_MIN_PAGINAS else None
+    with ThreadPoolExecutor(max_workers=len(host_sems) * max_per_host) as pool:
+        futuros = {pool.submit(fetch, job, parse_pool): job for job in jobs}
+        for futuro in as_completed(futuros):
+            yield futuros.pop(futuro), futuro.result()
+
+def paginas_completas(jobs: List[dict], resultados) -> Iterator[Tuple[str, str, str, Optional[List[SlotGolf]]]]:
+    """Agrupa los resultados por venue/fecha (todos sus hoyos) y genera
+    (venue, fecha, variante, slots) apenas llega el último job de cada una.
+    slots es None si algún timesheet de la página falló."""
+    faltan = Counter((job["venue"], job["fecha"]) for job in jobs)
+    abiertas = {}
+    for job, slots in resultados:
+        key = (job["venue"], job["fecha"])
+        pagina = abiertas.setdefault(key, {"hoyos": set(), "slots": []})
+        pagina["hoyos"].add(str(job["hoyos"]))
+        if slots is None or pagina["slots"] is None:
+            pagina["slots"] = None
+        else:
+            pagina["slots"].extend(slots)
+        faltan[key] -= 1
+        if not faltan[key]:
+            del abiertas[key]
+            yield job["venue"], job["fecha"], ",".join(sorted(pagina["hoyos"])), pagina["slots"]
+
+def load_courses() -> dict:
+    course_path = Path(__file__).parent / "venues" / "golf_venues.json"
+    try:
+        return json.loads(course_path.read_text())
+    except Exception as e:
+        raise RuntimeError(f"❌ Could not load {course_path}: {e}")
+
+def scrape_days(dias: List[date], max_per_host: int = MAX_PER_HOST, courses: dict = None):
+    COURSES = courses if courses is not None else load_courses()
+
+    crear_tabla_golf_postgres()
+    huellas = Huellas("golf_horarios")
+    jobs = build_jobs(COURSES, dias)
+
+    # Cada venue/fecha se guarda apenas se completa. Si tiene algún timesheet
+    # caído queda fuera del alcance: se conservan sus filas publicadas en vez
+    # de darlas por desaparecidas. La huella es por venue/fecha (todos sus
+    # hoyos), que es la unidad del alcance; la variante registra qué hoyos cubre.
+    guardados = 0
+    for venue, fecha, variante, slots in paginas_completas(jobs, fetch_all_slots(jobs, max_per_host)):
+        if slots is not None and huellas.cambio(venue, fecha, variante, slots):
+            guardar_golf_postgres(slots)
+            guardados += len(slots)
+    print(f"{len(huellas.nuevas)} venue/fechas con cambios ({guardados} slots), {huellas.sin_cambios} iguales")
+
+    publicar_tabla(
+        "golf_horarios",
+        claves=["venue", "fecha", "hora", "hoyos"],
+        valores=["lugares", "link", "hora_bucket"],
+        alcance=huellas.alcance(),
+        indices=[("fecha", "venue", "hora_bucket"), ("fecha", "hora")],
+        huellas=huellas
+    )
+    return guardados
+
+def scrapear(desde: int = 0, dias: int = 28, max_per_host: int = MAX_PER_HOST):
+    """Scrapea y publica los días [hoy + desde, hoy + desde + dias)."""
+    return scrape_days(dias_horizonte(desde, dias), max_per_host)
+
+def main(max_per_host: int = MAX_PER_HOST):
+    return scrape_days(next_n_full_weeks(4), max_per_host)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from registros import Intervalo
+
+# ──────────────────────────────────────────────────────────────
+# Intervalos libres de Pittwater
+#
+# Los bloques libres de la grilla (registros.BloqueLibre) se unen en
+# intervalos máximos por cancha/día, que es lo que se guarda en
+# futsal_intervalos; las duraciones se resuelven al leer. El motor de ticks
+# que expandía a slots por duración quedó en bench/intervalos_ticks.py.
+# ──────────────────────────────────────────────────────────────
+FORMATO_FECHA = "%d-%m-%Y"
+FORMATO_HORA = "%I:%M%p"
+
+def parser_bloques():
+    """Función (fecha, hora) -> datetime de un bloque, con cache."""
+    # Hay pocos días y pocas horas distintas: se parsea cada valor una vez
+    dias, horas = {}, {}
+    def parsear(fecha, hora):
+        dia = dias.get(fecha)
+        if dia is None:
+            dia = dias[fecha] = datetime.strptime(fecha, FORMATO_FECHA)
+        desde = horas.get(hora)
+        if desde is None:
+            t = datetime.strptime(hora, FORMATO_HORA)
+            desde = horas[hora] = timedelta(hours=t.hour, minutes=t.minute)
+        return dia + desde
+    return parsear
+
+def unir_bloques(bloques):
+    """Une bloques libres solapados o contiguos en intervalos máximos por
+    (venue, court, fecha). Devuelve Intervalo con fecha %Y%m%d."""
+    parsear = parser_bloques()
+    filas = []
+    for b in bloques:
+        inicio, fin = parsear(b.fecha, b.hora_inicio), parsear(b.fecha, b.hora_fin)
+        if fin > inicio:
+            filas.append(((b.venue, b.court, b.fecha), inicio, fin))
+    filas.sort(key=lambda f: (f[0], f[1]))
+
+    # Arranca un intervalo nuevo cuando cambia la cancha/día o cuando el
+    # bloque empieza después del fin más tardío visto hasta ahí
+    intervalos = []
+    actual = None
+    for clave, inicio, fin in filas:
+        if actual is not None and actual[0] == clave and inicio <= actual[2]:
+            actual[2] = max(actual[2], fin)
+            continue
+        if actual is not None:
+            intervalos.append(actual)
+        actual = [clave, inicio, fin]
+    if actual is not None:
+        intervalos.append(actual)
+    return [
+        Intervalo(venue, court, inicio.strftime("%Y%m%d"), inicio, fin)
+        for (venue, court, _), inicio, fin in intervalos
+    ]
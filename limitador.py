@@ -0,0 +1,123 @@
+import os
+import time
+import asyncio
+import threading
+import requests
+from metricas import FETCH_SEGUNDOS, LIMITE_ESPERA_SEGUNDOS, LIMITE_RPS, FRENADAS, host
+
+# ──────────────────────────────────────────────────────────────
+# Límite de requests por host, compartido por todos los scrapers
+#
+# Token bucket por host: cada request reserva un token y espera lo que
+# falte para que le toque, así N threads o tareas sobre el mismo host salen
+# espaciadas a la tasa actual sin dormir de más. La tasa se ajusta sola
+# (AIMD): sube de a poco mientras las respuestas vienen bien y se divide a la
+# mitad ante un 429, un 5xx o un timeout, con una pausa para todo el host
+# (Retry-After si el sitio la manda, si no exponencial).
+# ──────────────────────────────────────────────────────────────
+LIMITE_ENABLED = os.getenv("LIMITE_ENABLED", "1") == "1"
+# Cuánto puede alejarse la tasa de la inicial de cada fuente, en cada sentido
+LIMITE_FACTOR = float(os.getenv("LIMITE_FACTOR", "4"))
+LIMITE_PAUSA_MAX = float(os.getenv("LIMITE_PAUSA_MAX", "60"))
+REINTENTOS = int(os.getenv("LIMITE_REINTENTOS", "2"))
+
+def frena(status):
+    return status is not None and (status == 429 or status >= 500)
+
+class Limitador:
+    def __init__(self, nombre, rps):
+        self.nombre = nombre
+        self.minima = rps / LIMITE_FACTOR
+        self.maxima = rps * LIMITE_FACTOR
+        self.tasa = rps
+        # Respuestas sanas: +5% de la inicial por segundo, aprox.
+        self.paso = rps * 0.05
+        # Ráfaga de un token: el primer request sale ya, el resto espaciado
+        self.tokens = 1.0
+        self.ultimo = time.monotonic()
+        self.pausa_hasta = 0.0
+        self.frenadas_seguidas = 0
+        self._lock = threading.Lock()
+        LIMITE_RPS.labels(nombre).set(self.tasa)
+
+    def _reservar(self):
+        """Toma un token y devuelve cuántos segundos esperar antes de usarlo."""
+        if not LIMITE_ENABLED:
+            return 0.0
+        with self._lock:
+            ahora = time.monotonic()
+            self.tokens = min(1.0, self.tokens + (ahora - self.ultimo) * self.tasa)
+            self.ultimo = ahora
+            self.tokens -= 1
+            espera = max(-self.tokens / self.tasa if self.tokens < 0 else 0.0, self.pausa_hasta - ahora)
+        LIMITE_ESPERA_SEGUNDOS.labels(self.nombre).observe(espera)
+        return espera
+
+    def esperar(self):
+        time.sleep(self._reservar())
+
+    async def esperar_async(self):
+        await asyncio.sleep(self._reservar())
+
+    def registrar(self, status=None, error=None, retry_after=None):
+        """Ajusta la tasa según el resultado de un request (status o excepción)."""
+        if error is None and not frena(status):
+            with self._lock:
+                self.frenadas_seguidas = 0
+                self.tasa = min(self.maxima, self.tasa + self.paso / self.tasa)
+            LIMITE_RPS.labels(self.nombre).set(self.tasa)
+            return
+        motivo = "timeout" if error is not None else str(status)
+        with self._lock:
+            # Los requests que ya estaban en vuelo cuando arrancó la pausa
+            # traen la misma noticia: se baja una sola vez por pausa
+            if time.monotonic() >= self.pausa_hasta:
+                self.tasa = max(self.minima, self.tasa / 2)
+            self.frenadas_seguidas += 1
+            pausa = min(LIMITE_PAUSA_MAX, 2 ** self.frenadas_seguidas)
+            if retry_after is not None:
+                try:
+                    pausa = min(LIMITE_PAUSA_MAX, float(retry_after))
+                except ValueError:
+                    pass
+            self.pausa_hasta = max(self.pausa_hasta, time.monotonic() + pausa)
+            # Lo acumulado se pierde: después de la pausa se arranca de cero
+            self.tokens = min(self.tokens, 0.0)
+        LIMITE_RPS.labels(self.nombre).set(self.tasa)
+        FRENADAS.labels(self.nombre, motivo).inc()
+        print(f"⚠️  {self.nombre}: {motivo}, baja a {self.tasa:.2f} req/s y pausa {pausa:.0f}s")
+
+_limitadores = {}
+_limitadores_lock = threading.Lock()
+
+def para(url, rps):
+    """Limitador del host de `url`. `rps` es la tasa inicial si todavía no existe."""
+    nombre = host(url)
+    with _limitadores_lock:
+        lim = _limitadores.get(nombre)
+        if lim is None:
+            lim = _limitadores[nombre] = Limitador(nombre, rps)
+        return lim
+
+def get(session, url, rps, fuente, reintentos=REINTENTOS, **kwargs):
+    """session.get pasando por el limitador del host, con reintentos ante
+    429/5xx/timeouts. Devuelve la respuesta (ya con raise_for_status).
+    FETCH_SEGUNDOS de `fuente` mide sólo cada request, sin la espera del
+    limitador (que va a LIMITE_ESPERA_SEGUNDOS)."""
+    lim = para(url, rps)
+    fetch_segundos = FETCH_SEGUNDOS.labels(fuente, lim.nombre)
+    for intento in range(reintentos + 1):
+        lim.esperar()
+        try:
+            with fetch_segundos.time():
+                response = session.get(url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            lim.registrar(error=e)
+            if intento == reintentos:
+                raise
+            continue
+        lim.registrar(response.status_code, retry_after=response.headers.get("Retry-After"))
+        if frena(response.status_code) and intento < reintentos:
+            continue
+        response.raise_for_status()
+        return response
@@ -0,0 +1,63 @@
+import os
+from urllib.parse import urlparse
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+# ──────────────────────────────────────────────────────────────
+# Métricas Prometheus de scrapers y API
+#
+# Los scrapers corren en el proceso del scheduler, que las expone en
+# METRICAS_PORT; la API las sirve en GET /metrics.
+# ──────────────────────────────────────────────────────────────
+METRICAS_PORT = int(os.getenv("METRICAS_PORT", "0"))
+
+BUCKETS_RED = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+BUCKETS_FILAS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+# Scrapers
+FETCH_SEGUNDOS = Histogram(
+    "scraper_fetch_segundos", "Latencia de cada request o navegación, por host",
+    ["fuente", "host"], buckets=BUCKETS_RED
+)
+PARSE_SEGUNDOS = Histogram(
+    "scraper_parse_segundos", "Tiempo de parseo de cada página", ["fuente"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+FILAS = Counter("scraper_filas", "Slots producidos", ["fuente", "venue"])
+FALLAS = Counter("scraper_fallas", "Páginas que no se pudieron leer", ["fuente", "venue"])
+LIMITE_RPS = Gauge("scraper_limite_rps", "Tasa actual del limitador de cada host (req/s)", ["host"])
+LIMITE_ESPERA_SEGUNDOS = Histogram(
+    "scraper_limite_espera_segundos", "Espera en el limitador antes de cada request, por host",
+    ["host"], buckets=(0, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+FRENADAS = Counter("scraper_frenadas", "Veces que un host pidió bajar la velocidad", ["host", "motivo"])
+PAGINAS = Counter("scraper_paginas", "Páginas leídas, según si cambió su huella", ["tabla", "resultado"])
+ESCRITURA_SEGUNDOS = Histogram(
+    "db_escritura_segundos", "guardar_* en staging y publicar_tabla", ["tabla", "etapa"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+PUBLICADAS = Counter("db_publicadas", "Filas tocadas al publicar", ["tabla", "tipo"])
+JOB_SEGUNDOS = Histogram(
+    "scheduler_job_segundos", "Duración de cada job del scheduler", ["fuente", "tramo", "resultado"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+)
+
+# API
+API_SEGUNDOS = Histogram(
+    "api_request_segundos", "Latencia por endpoint", ["endpoint", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+API_DB_SEGUNDOS = Histogram(
+    "api_db_segundos", "Tiempo de cada query a Postgres por endpoint", ["endpoint"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+API_FILAS = Histogram("api_filas_devueltas", "Filas devueltas por request", ["endpoint"], buckets=BUCKETS_FILAS)
+API_SUSCRIPCIONES = Gauge("api_suscripciones_eventos", "Clientes conectados a /disponibilidad_eventos")
+
+def host(url):
+    return urlparse(url).hostname or "desconocido"
+
+def iniciar_servidor(port=METRICAS_PORT):
+    """Expone /metrics en `port` (0 = apagado). Para procesos sin API: scheduler."""
+    if port:
+        start_http_server(port)
+        print(f"Métricas en :{port}/metrics")
@@ -0,0 +1,86 @@
+import os
+from datetime import datetime, date, time, timedelta
+from zoneinfo import ZoneInfo
+
+# ──────────────────────────────────────────────────────────────
+# Normalización de fechas y horas
+#
+# Los scrapers normalizan al ingerir (DATE/TIME + bucket de media hora) y la
+# API sólo parsea los parámetros de la query, nunca las filas.
+# ──────────────────────────────────────────────────────────────
+FORMATOS_HORA = ["%H:%M", "%I:%M %p", "%I:%M%p"]
+FORMATOS_FECHA = ["%Y%m%d", "%Y-%m-%d", "%d-%m-%Y"]
+
+# fecha/hora de los slots son locales de los venues (Sydney); el contenedor
+# corre en UTC, así que "hoy" y "ahora" se toman siempre en esta zona
+VENUES_TZ = ZoneInfo(os.getenv("VENUES_TZ", "Australia/Sydney"))
+
+def ahora_venues():
+    """datetime naive con la hora local de los venues."""
+    return datetime.now(VENUES_TZ).replace(tzinfo=None)
+
+def dias_horizonte(desde, dias):
+    """Las fechas [hoy + desde, hoy + desde + dias), con hoy el de los venues."""
+    hoy = ahora_venues().date()
+    return [hoy + timedelta(days=i) for i in range(desde, desde + dias)]
+
+def parsear_hora(hora_str):
+    """'7:30pm', '07:30 PM', '19:30' -> time(19, 30). None si no se reconoce."""
+    if isinstance(hora_str, time):
+        return hora_str
+    s = hora_str.upper().replace('.', '').replace('AM', ' AM').replace('PM', ' PM')
+    s = " ".join(s.split())
+    for fmt in FORMATOS_HORA:
+        try:
+            return datetime.strptime(s, fmt).time()
+        except ValueError:
+            continue
+    return None
+
+def parsear_fecha(fecha_str):
+    """'20250528', '2025-05-28', '28-05-2025' -> date. None si no se reconoce."""
+    if isinstance(fecha_str, date):
+        return fecha_str
+    for fmt in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(fecha_str.strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def bucket_media_hora(t):
+    """Redondea a la media hora más cercana (:15 y :45 suben), igual que el
+    viejo redondear_a_media_hora de la API."""
+    minutos = t.hour * 60 + t.minute
+    hora, resto = divmod(minutos, 60)
+    if resto < 15:
+        minutos = hora * 60
+    elif resto < 45:
+        minutos = hora * 60 + 30
+    else:
+        minutos = (hora + 1) * 60
+    minutos %= 24 * 60
+    return time(minutos // 60, minutos % 60)
+
+def formatear_hora(t):
+    return t.strftime("%I:%M %p")
+
+def filas_tipadas(filas, idx_fecha, idx_hora):
+    """Convierte fecha/hora de cada tupla a DATE/TIME y agrega el bucket de
+    media hora al final. Las filas que no se pueden parsear se descartan."""
+    tipadas = []
+    descartadas = 0
+    for fila in filas:
+        fila = list(fila)
+        fecha = parsear_fecha(fila[idx_fecha])
+        hora = parsear_hora(fila[idx_hora])
+        if fecha is None or hora is None:
+            descartadas += 1
+            continue
+        fila[idx_fecha] = fecha
+        fila[idx_hora] = hora
+        fila.append(bucket_media_hora(hora))
+        tipadas.append(tuple(fila))
+    if descartadas:
+        print(f"⚠️  {descartadas} filas con fecha/hora irreconocible descartadas.")
+    return tipadas
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+from datetime import datetime
+from html import unescape
+from operator import itemgetter
+from typing import List, Tuple
+from bs4 import BeautifulSoup
+
+# ──────────────────────────────────────────────────────────────
+# Parsers de timesheets MiClub
+#
+# Módulo aparte y liviano (sin db_utils ni requests) porque corre en los
+# procesos de parseo de golf_scrapper. Dos backends con la misma salida:
+#   filas: extractor dirigido que recorre sólo los tags del HTML con una
+#          regex y lleva la cuenta de los <div> para saber dónde termina
+#          cada fila; no arma árbol.
+#   bs4:   BeautifulSoup + select, como antes (referencia y fallback).
+# bench/bench_parser.py verifica que den lo mismo que el parser original.
+# ──────────────────────────────────────────────────────────────
+GOLF_PARSER = os.getenv("GOLF_PARSER", "filas")
+
+FORMATO_HORA = "%I:%M %p"
+
+# Hora de la fila ya parseada (o None si no es una hora): se repiten
+# entre páginas, así que cada texto se parsea una vez por proceso
+_horas = {}
+
+def _hora(texto):
+    if texto not in _horas:
+        try:
+            _horas[texto] = datetime.strptime(texto, FORMATO_HORA)
+        except ValueError:
+            _horas[texto] = None
+    return _horas[texto]
+
+def _ordenar(filas):
+    # Orden por hora (estable, como el sort original) y formato canónico
+    return [(t.strftime(FORMATO_HORA), free) for t, free in sorted(filas, key=itemgetter(0))]
+
+def parse_bs4(html: str) -> List[Tuple[str, int]]:
+    soup = BeautifulSoup(html, "html.parser")
+
+    filas = []
+    for row in soup.select("div.row-time"):
+        h3 = row.find("h3")
+        if not h3:
+            continue
+        t = _hora(h3.get_text(strip=True))
+        if t is None:
+            continue
+        free = len(row.select("div.cell-available"))
+        if free:
+            filas.append((t, free))
+    return _ordenar(filas)
+
+# Comentarios y scripts se saltean enteros; del resto sólo interesan los
+# tags (nombre, atributos, si es cierre o autocerrado)
+_TAGS = re.compile(
+    r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*?)(/?)>",
+    re.S | re.I,
+)
+_COMENTARIOS = re.compile(r"<!--.*?-->", re.S)
+_ENTRE_TAGS = re.compile(r"<[^>]*>")
+_CLASE = re.compile(r"""(?:^|\s)class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""", re.I)
+
+def _clases(atributos):
+    m = _CLASE.search(atributos)
+    return (m.group(1) or m.group(2) or m.group(3) or "").split() if m else ()
+
+def _texto(interior):
+    # Igual que get_text(strip=True): cada fragmento de texto entre tags
+    # se limpia por separado y se pegan sin separador
+    fragmentos = (unescape(f).strip() for f in _ENTRE_TAGS.split(_COMENTARIOS.sub("", interior)))
+    return "".join(f for f in fragmentos if f)
+
+def parse_filas(html: str) -> List[Tuple[str, int]]:
+    filas = []
+    profundidad = 0     # <div> abiertos dentro de la fila actual (0 = fuera de fila)
+    texto_h3 = None     # posición donde arranca el primer <h3> de la fila
+    h3 = None
+    free = 0
+    for m in _TAGS.finditer(html):
+        nombre = m.group(3)
+        if nombre is None:
+            continue
+        nombre = nombre.lower()
+        cierre, autocerrado = m.group(2), m.group(5)
+        if nombre == "h3" and profundidad:
+            if not cierre and h3 is None and texto_h3 is None:
+                texto_h3 = m.end()
+            elif cierre and texto_h3 is not None and h3 is None:
+                h3 = _texto(html[texto_h3:m.start()])
+            continue
+        if nombre != "div":
+            continue
+        if cierre:
+            if profundidad:
+                profundidad -= 1
+                if not profundidad:
+                    t = _hora(h3) if h3 is not None else None
+                    if t is not None and free:
+                        filas.append((t, free))
+            continue
+        clases = _clases(m.group(4))
+        if not profundidad:
+            if "row-time" in clases and not autocerrado:
+                profundidad, texto_h3, h3, free = 1, None, None, 0
+            continue
+        if "cell-available" in clases:
+            free += 1
+        if not autocerrado:
+            profundidad += 1
+    return _ordenar(filas)
+
+PARSERS = {"filas": parse_filas, "bs4": parse_bs4}
+
+def parsear_timesheet(html: str, parser: str = GOLF_PARSER) -> Tuple[List[Tuple[str, int]], float]:
+    """(slots, segundos de parseo). Corre en un proceso del pool: el tiempo
+    se devuelve para observarlo en la métrica del proceso principal."""
+    t0 = time.perf_counter()
+    slots = PARSERS[parser](html)
+    return slots, time.perf_counter() - t0
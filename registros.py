@@ -0,0 +1,35 @@
+from collections import namedtuple
+from itertools import islice
+
+# ──────────────────────────────────────────────────────────────
+# Registros de slots
+#
+# Los scrapers producen namedtuples en vez de dicts y DataFrames: pesan lo
+# mismo que una tupla, son hashables (dedup con un set) y van tal cual al
+# ESCRITOR. Cada página se dedupea y se encola apenas se lee, en lotes
+# acotados, sin juntar la corrida entera en memoria.
+# ──────────────────────────────────────────────────────────────
+SlotTennis = namedtuple("SlotTennis", "venue fecha cancha hora link")
+SlotGolf = namedtuple("SlotGolf", "venue fecha hora hoyos lugares link")
+SlotFutsal = namedtuple("SlotFutsal", "venue fecha hora minutos court link")
+# Pittwater: bloque libre tal como lo muestra la grilla (fecha %d-%m-%Y,
+# horas "9:00am") e intervalo ya unido (inicio/fin datetime)
+BloqueLibre = namedtuple("BloqueLibre", "venue court fecha hora_inicio hora_fin")
+Intervalo = namedtuple("Intervalo", "venue court fecha inicio fin")
+
+def sin_duplicados(registros):
+    """Los registros en el orden en que llegan, salteando repetidos."""
+    vistos = set()
+    for registro in registros:
+        if registro not in vistos:
+            vistos.add(registro)
+            yield registro
+
+def en_lotes(registros, tamanio):
+    """Parte un iterable en listas de a lo sumo `tamanio` elementos."""
+    registros = iter(registros)
+    while True:
+        lote = list(islice(registros, tamanio))
+        if not lote:
+            return
+        yield lote
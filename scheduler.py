@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+import nest_asyncio
+
+import tennis_scrapper
+import golf_scrapper
+import soccer_scrapper
+import metricas
+
+nest_asyncio.apply()
+
+# ──────────────────────────────────────────────────────────────
+# Scheduler único para los tres scrapers
+#
+# En vez de re-scrapear 28 días cada vez, el horizonte se parte en tramos
+# con frescura distinta: hoy/mañana cada pocos minutos, el resto de la
+# semana cada hora y las semanas siguientes una vez por día. Los jobs listos
+# arrancan por tramo (los cercanos primero) y prioridad de fuente, dentro de
+# un presupuesto global de jobs simultáneos. Cada fuente corre de a un job
+# por vez porque comparte su tabla de staging.
+# ──────────────────────────────────────────────────────────────
+TRAMOS = [
+    # (nombre, primer día desde hoy, cantidad de días, cada cuántos segundos).
+    # "Hoy" es el de los venues (normalizacion.dias_horizonte), no el del
+    # contenedor en UTC: si no, en la mañana de Sydney cerca cubriría ayer y hoy
+    ("cerca", 0, 2, int(os.getenv("SCHED_CERCA_SEGUNDOS", str(5 * 60)))),
+    ("semana", 2, 5, int(os.getenv("SCHED_SEMANA_SEGUNDOS", str(60 * 60)))),
+    ("lejos", 7, 21, int(os.getenv("SCHED_LEJOS_SEGUNDOS", str(24 * 60 * 60)))),
+]
+
+async def _tennis(desde, dias):
+    await tennis_scrapper.scrapear(desde, dias, max_concurrent=int(os.getenv("TENNIS_MAX_CONCURRENT", "2")))
+
+async def _golf(desde, dias):
+    await asyncio.to_thread(golf_scrapper.scrapear, desde, dias)
+
+async def _futsal(desde, dias):
+    await soccer_scrapper.scrapear(desde, dias)
+
+FUENTES = {
+    # nombre: (prioridad, menor = primero; función async (desde, dias))
+    "tennis": (0, _tennis),
+    "golf": (1, _golf),
+    "futsal": (2, _futsal),
+}
+
+MAX_JOBS = int(os.getenv("SCHED_MAX_JOBS", "2"))
+TICK_SEGUNDOS = 5
+# Un job que falló se reintenta a los REINTENTO segundos, duplicando con cada
+# falla seguida, sin pasar del intervalo normal de su tramo
+REINTENTO_SEGUNDOS = int(os.getenv("SCHED_REINTENTO_SEGUNDOS", "60"))
+
+class Job:
+    def __init__(self, fuente, tramo_idx):
+        self.fuente = fuente
+        self.tramo_idx = tramo_idx
+        self.proxima = 0.0  # todos arrancan vencidos
+        self.fallas = 0     # fallas seguidas, para el backoff
+
+    @property
+    def nombre(self):
+        return f"{self.fuente}/{TRAMOS[self.tramo_idx][0]}"
+
+    def orden(self):
+        return (self.tramo_idx, FUENTES[self.fuente][0], self.proxima)
+
+async def correr_job(job, sem, ocupadas):
+    _, desde, dias, cada = TRAMOS[job.tramo_idx]
+    _, fn = FUENTES[job.fuente]
+    t0 = time.time()
+    print(f"[INICIO] {job.nombre} días {desde}-{desde + dias - 1}")
+    resultado = "ok"
+    # El próximo turno se cuenta desde que arrancó, no desde que terminó
+    proxima = t0 + cada
+    try:
+        await fn(desde, dias)
+        job.fallas = 0
+        print(f"[FIN]    {job.nombre} ({time.time() - t0:.1f}s)")
+    except Exception as e:
+        resultado = "error"
+        # Sin esperar el turno entero (un día en lejos): backoff desde que falló
+        espera = min(cada, REINTENTO_SEGUNDOS * 2 ** job.fallas)
+        job.fallas += 1
+        proxima = time.time() + espera
+        print(f"❌ Error en {job.nombre} ({time.time() - t0:.1f}s): {e}; reintento en {espera:.0f}s")
+    finally:
+        metricas.JOB_SEGUNDOS.labels(job.fuente, TRAMOS[job.tramo_idx][0], resultado).observe(time.time() - t0)
+        job.proxima = proxima
+        ocupadas.discard(job.fuente)
+        sem.release()
+
+async def main(max_jobs=MAX_JOBS):
+    metricas.iniciar_servidor()
+    jobs = [Job(fuente, i) for fuente in FUENTES for i in range(len(TRAMOS))]
+    sem = asyncio.Semaphore(max_jobs)
+    ocupadas = set()
+    corriendo = set()
+    while True:
+        ahora = time.time()
+        listos = sorted(
+            (j for j in jobs if j.proxima <= ahora and j.fuente not in ocupadas),
+            key=Job.orden
+        )
+        for job in listos:
+            if sem.locked():
+                break
+            if job.fuente in ocupadas:
+                continue
+            await sem.acquire()
+            ocupadas.add(job.fuente)
+            job.proxima = float("inf")  # no re-encolar mientras corre
+            tarea = asyncio.create_task(correr_job(job, sem, ocupadas))
+            corriendo.add(tarea)
+            tarea.add_done_callback(corriendo.discard)
+        await asyncio.sleep(TICK_SEGUNDOS)
+
+if __name__ == "__main__":
+    asyncio.run(main())
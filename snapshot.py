@@ -0,0 +1,125 @@
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import select, text
+from normalizacion import formatear_hora
+
+# ──────────────────────────────────────────────────────────────
+# Snapshot en memoria de la disponibilidad
+#
+# Índice por tabla -> fecha -> venue -> bucket de media hora -> filas, ya
+# formateadas como las devuelve la API. Sólo se recarga una tabla cuando su
+# generación (tabla `generaciones`, la bumpea publicar_tabla) cambia o cuando
+# la ventana de fechas avanza de día. La memoria queda acotada a la ventana.
+# ──────────────────────────────────────────────────────────────
+class Snapshot:
+    def __init__(self, engine, tablas, dias_atras=7, dias_adelante=28, intervalo=30):
+        self.engine = engine
+        self.tablas = tablas
+        self.dias_atras = dias_atras
+        self.dias_adelante = dias_adelante
+        self.intervalo = intervalo
+        # nombre de tabla -> {"generacion", "desde", "hasta", "dias"}; se
+        # reemplaza entero en cada recarga, los lectores nunca ven media carga
+        self._datos = {}
+        # Última generación publicada de cada tabla (cargada o no en memoria)
+        self.generaciones = {}
+        self._hilo = None
+
+    def ventana(self):
+        hoy = date.today()
+        return hoy - timedelta(days=self.dias_atras), hoy + timedelta(days=self.dias_adelante)
+
+    def refrescar(self):
+        desde, hasta = self.ventana()
+        with self.engine.connect() as conn:
+            # La generación se lee antes que las filas: si se publica algo en el
+            # medio, la próxima vuelta ve una generación nueva y recarga
+            gens = dict(conn.execute(text("SELECT tabla, generacion FROM generaciones")).all())
+            for nombre, tabla in self.tablas.items():
+                if tabla is None or nombre not in gens:
+                    continue
+                actual = self._datos.get(nombre)
+                if actual and actual["generacion"] == gens[nombre] and actual["desde"] == desde:
+                    continue
+                t0 = time.time()
+                self._datos[nombre] = self._cargar(conn, tabla, gens[nombre], desde, hasta)
+                print(f"Snapshot {nombre} generación {gens[nombre]} cargado en {time.time() - t0:.2f}s")
+        # Recién después de recargar, para que quien mire la generación no
+        # se adelante a los datos en memoria
+        self.generaciones = gens
+
+    def _cargar(self, conn, tabla, generacion, desde, hasta):
+        dias = {}
+        query = (
+            select(tabla)
+            .where(tabla.c.fecha.between(desde, hasta))
+            .order_by(tabla.c.fecha, tabla.c.venue, tabla.c.hora)
+        )
+        for row in conn.execute(query):
+            m = row._mapping
+            fila = {}
+            for c in tabla.c:
+                if c.name == "fecha":
+                    fila["fecha"] = m["fecha"].strftime("%Y%m%d")
+                elif c.name == "hora":
+                    fila["hora"] = formatear_hora(m["hora"])
+                elif c.name == "hora_bucket":
+                    fila["hora_redondeada"] = formatear_hora(m["hora_bucket"])
+                else:
+                    fila[c.name] = m[c.name]
+            buckets = dias.setdefault(m["fecha"], {}).setdefault(m["venue"], {})
+            buckets.setdefault(m["hora_bucket"], []).append((m["hora"], fila))
+        return {"generacion": generacion, "desde": desde, "hasta": hasta, "dias": dias}
+
+    def generacion(self, nombre):
+        actual = self._datos.get(nombre)
+        return actual["generacion"] if actual else None
+
+    def _dia(self, nombre, fecha):
+        actual = self._datos.get(nombre)
+        if actual is None or not (actual["desde"] <= fecha <= actual["hasta"]):
+            return None
+        return actual["dias"].get(fecha, {})
+
+    def _recorrer(self, dia, venue=None, hora=None, bucket=None, extra=None):
+        venues = [venue] if venue else list(dia)
+        for v in venues:
+            buckets = dia.get(v, {})
+            for b in ([bucket] if bucket else list(buckets)):
+                for hora_fila, fila in buckets.get(b, ()):
+                    if hora and hora_fila != hora:
+                        continue
+                    if extra and any(fila[k] != val for k, val in extra.items()):
+                        continue
+                    yield fila
+
+    def filas(self, nombre, fecha, venue=None, hora=None, bucket=None, extra=None):
+        """Filas de un día, o None si la fecha no está cubierta (ir a la base)."""
+        dia = self._dia(nombre, fecha)
+        if dia is None:
+            return None
+        return list(self._recorrer(dia, venue, hora, bucket, extra))
+
+    def venues(self, nombre, fecha, venue=None, hora=None, bucket=None):
+        dia = self._dia(nombre, fecha)
+        if dia is None:
+            return None
+        encontrados = set()
+        for v in ([venue] if venue else list(dia)):
+            if v in dia and any(True for _ in self._recorrer(dia, v, hora, bucket)):
+                encontrados.add(v)
+        return encontrados
+
+    def _loop(self):
+        while True:
+            try:
+                self.refrescar()
+            except Exception as e:
+                print(f"❌ Error refrescando snapshot: {e}")
+            time.sleep(self.intervalo)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._loop, daemon=True)
+            self._hilo.start()
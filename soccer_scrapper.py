@@ -1,10 +1,13 @@
 import os
 import requests
-import pandas as pd
-from datetime import datetime, date, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from dateutil import parser
-import psycopg2
-from psycopg2.extras import execute_values
+from db_utils import crear_tabla_staging, publicar_tabla, staging, Huellas, ESCRITOR, ESCRITOR_LOTE
+from normalizacion import filas_tipadas, parsear_fecha, dias_horizonte
+from intervalos import unir_bloques
+from registros import SlotFutsal, BloqueLibre, en_lotes
+from metricas import FETCH_SEGUNDOS, PARSE_SEGUNDOS, FILAS, FALLAS, host
+import limitador
 import nest_asyncio
 import asyncio
 from playwright.async_api import async_playwright
@@ -25,202 +28,304 @@ KIKOFF_DURATION_IDS = {
     120: "60569034"
 }
 KIKOFF_HEADERS = {"Accept": "application/json", "User-Agent": "Mozilla/5.0"}
+KIKOFF_API_URL = os.getenv(
+    "KIKOFF_API_URL", "https://app.squarespacescheduling.com/api/scheduling/v1/availability/times"
+)
+# Días por request a Squarespace (antes 1)
+KIKOFF_MAX_DAYS = int(os.getenv("KIKOFF_MAX_DAYS", "7"))
+# Tasas iniciales de los limitadores por host (req/s), se adaptan solas
+KIKOFF_RPS = float(os.getenv("KIKOFF_RPS", "4"))
+PITTWATER_RPS = float(os.getenv("PITTWATER_RPS", "1"))
+
+PITTWATER_URL = os.getenv("PITTWATER_URL", "https://pittwater-rsl-futsal.yepbooking.com.au/")
+PITTWATER_TIMEOUT_MS = 15000
 
 # ──────────────────────────────────────────────────────────────
 # PostgreSQL helpers
 # ──────────────────────────────────────────────────────────────
-def get_conn():
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    return psycopg2.connect(DATABASE_URL)
-
 def crear_tabla_futsal():
-    conn = get_conn()
-    cur = conn.cursor()
-    # Borra la tabla si existe
-    cur.execute("DROP TABLE IF EXISTS futsal_horarios;")
-    # Crea la tabla con el constraint correcto
-    cur.execute("""
-        CREATE TABLE futsal_horarios (
-            id SERIAL PRIMARY KEY,
-            venue TEXT,
-            fecha TEXT,
-            hora TEXT,
-            minutos INTEGER,
-            court TEXT,
-            link TEXT,
-            UNIQUE(venue, fecha, hora, court, minutos)
-        );
+    crear_tabla_staging("futsal_horarios", """
+        id SERIAL PRIMARY KEY,
+        venue TEXT,
+        fecha DATE,
+        hora TIME,
+        minutos INTEGER,
+        court TEXT,
+        link TEXT,
+        hora_bucket TIME,
+        UNIQUE(venue, fecha, hora, court, minutos)
     """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-def guardar_futsal_df(df):
-    if df.empty:
-        print("No hay datos de futsal para guardar.")
-        return
-    conn = get_conn()
-    with conn:
-        with conn.cursor() as cur:
-            venues = df['venue'].unique()
-            fechas = df['fecha'].unique()
-            for venue in venues:
-                for fecha in fechas:
-                    cur.execute("DELETE FROM futsal_horarios WHERE venue=%s AND fecha=%s", (venue, fecha))
-            rows = list(df[['venue', 'fecha', 'hora', 'minutos', 'court', 'link']].itertuples(index=False, name=None))
-            execute_values(
-                cur,
-                "INSERT INTO futsal_horarios (venue, fecha, hora, minutos, court, link) VALUES %s ON CONFLICT DO NOTHING",
-                rows
-            )
-    conn.close()
+
+def crear_tabla_intervalos():
+    # Pittwater: intervalos libres contiguos por cancha/día; la duración se
+    # resuelve al leer (GET /disponibilidad_futsal), no al escribir
+    crear_tabla_staging("futsal_intervalos", """
+        id SERIAL PRIMARY KEY,
+        venue TEXT,
+        court TEXT,
+        fecha DATE,
+        rango TSRANGE,
+        link TEXT,
+        UNIQUE(venue, court, fecha, rango)
+    """)
+
+def guardar_intervalos(intervalos, link):
+    for lote in en_lotes(intervalos, ESCRITOR_LOTE):
+        rows = [(i.venue, i.court, parsear_fecha(i.fecha), f"[{i.inicio},{i.fin})", link) for i in lote]
+        ESCRITOR.escribir(staging("futsal_intervalos"), ['venue', 'court', 'fecha', 'rango', 'link'], rows)
+
+def guardar_futsal(slots):
+    for lote in en_lotes(slots, ESCRITOR_LOTE):
+        rows = filas_tipadas(lote, idx_fecha=1, idx_hora=2)
+        ESCRITOR.escribir(staging("futsal_horarios"), SlotFutsal._fields + ('hora_bucket',), rows)
 
 # ──────────────────────────────────────────────────────────────
 # Scraper KIKOFF (Squarespace Scheduling)
 # ──────────────────────────────────────────────────────────────
-def scrape_kikoff():
-    base_url = "https://app.squarespacescheduling.com/api/scheduling/v1/availability/times"
-    today = date.today()
-    day_range = [today + timedelta(days=i) for i in range(DAYS_TO_SCRAPE)]
-    all_rows = []
-    for duration, appointment_id in KIKOFF_DURATION_IDS.items():
-        for day in day_range:
-            params = {
-                "owner": KIKOFF_OWNER,
-                "appointmentTypeId": appointment_id,
-                "calendarId": "any",
-                "startDate": day.isoformat(),
-                "maxDays": 1,
-                "timezone": "Australia/Sydney"
-            }
-            try:
-                response = requests.get(base_url, params=params, headers=KIKOFF_HEADERS)
-                response.raise_for_status()
-                data = response.json()
-            except Exception as e:
-                print(f"KIKOFF error: {e}")
+def kikoff_rows(data, duration, appointment_id, day_range):
+    """SlotFutsal de una respuesta de Squarespace, sólo de los días pedidos."""
+    dias = {day.strftime("%Y%m%d") for day in day_range}
+    for _, slots in data.items():
+        for slot in slots:
+            dt = parser.parse(slot["time"])
+            if dt.strftime("%Y%m%d") not in dias:
                 continue
-            for _, slots in data.items():
-                for slot in slots:
-                    dt = parser.parse(slot["time"])
-                    time_iso = slot["time"]
-                    time_encoded = requests.utils.quote(time_iso)
-                    booking_url = (
-                        f"https://app.squarespacescheduling.com/schedule/"
-                        f"{KIKOFF_OWNER}/appointment/{appointment_id}/calendar/any/datetime/"
-                        f"{time_encoded}?categories%5B%5D=Pitch+Hire"
-                    )
-                    all_rows.append({
-                        "venue": "KIKOFF",
-                        "fecha": dt.strftime("%Y%m%d"),
-                        "hora": dt.strftime("%I:%M %p"),
-                        "minutos": duration,
-                        "court": "N/A",
-                        "link": booking_url
-                    })
-    return pd.DataFrame(all_rows)
+            time_iso = slot["time"]
+            time_encoded = requests.utils.quote(time_iso)
+            booking_url = (
+                f"https://app.squarespacescheduling.com/schedule/"
+                f"{KIKOFF_OWNER}/appointment/{appointment_id}/calendar/any/datetime/"
+                f"{time_encoded}?categories%5B%5D=Pitch+Hire"
+            )
+            yield SlotFutsal("KIKOFF", dt.strftime("%Y%m%d"), dt.strftime("%I:%M %p"), duration, "N/A", booking_url)
+
+def scrape_kikoff(max_days=KIKOFF_MAX_DAYS, desde=0, dias=DAYS_TO_SCRAPE):
+    # Un request por ventana de `max_days` días y por duración, todos en
+    # paralelo sobre una misma sesión keep-alive
+    base_url = KIKOFF_API_URL
+    day_range = dias_horizonte(desde, dias)
+    ventanas = [day_range[i:i + max_days] for i in range(0, len(day_range), max_days)]
+    jobs = [
+        (duration, appointment_id, ventana)
+        for duration, appointment_id in KIKOFF_DURATION_IDS.items()
+        for ventana in ventanas
+    ]
+
+    session = requests.Session()
+    session.headers.update(KIKOFF_HEADERS)
+    session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=len(jobs)))
+
+    def fetch(job):
+        duration, appointment_id, ventana = job
+        params = {
+            "owner": KIKOFF_OWNER,
+            "appointmentTypeId": appointment_id,
+            "calendarId": "any",
+            "startDate": ventana[0].isoformat(),
+            "maxDays": len(ventana),
+            "timezone": "Australia/Sydney"
+        }
+        try:
+            response = limitador.get(session, base_url, KIKOFF_RPS, "kikoff", params=params, timeout=30)
+            with PARSE_SEGUNDOS.labels("kikoff").time():
+                rows = list(kikoff_rows(response.json(), duration, appointment_id, ventana))
+        except Exception as e:
+            print(f"KIKOFF error: {e}")
+            FALLAS.labels("kikoff", "KIKOFF").inc()
+            return None
+        FILAS.labels("kikoff", "KIKOFF").inc(len(rows))
+        return rows
+
+    all_rows = []
+    fallidas = set()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        for (_, _, ventana), rows in zip(jobs, pool.map(fetch, jobs)):
+            if rows is None:
+                fallidas.update(day.strftime("%Y%m%d") for day in ventana)
+            else:
+                all_rows.extend(rows)
+    session.close()
+    # Las fechas de ventanas caídas se devuelven aparte para dejarlas fuera
+    # del alcance de la publicación
+    return all_rows, fallidas
 
 # ──────────────────────────────────────────────────────────────
 # Scraper Pittwater (YepBooking)
 # ──────────────────────────────────────────────────────────────
-async def scrape_pittwater_multiple_days(days_to_scrap=28):
+async def leer_dia_pittwater(page):
+    """(texto del encabezado, fecha %Y%m%d del día mostrado, bloques libres).
+    La fecha es la del sitio (Sydney), no la del contenedor."""
+    date_header = await page.query_selector("h3")
+    date_text = await date_header.inner_text()
+    dia = parser.parse(date_text)
+    current_date = dia.strftime("%d-%m-%Y")
+
+    rows = []
+    slots = await page.query_selector_all("a.empty")
+    for slot in slots:
+        title = await slot.get_attribute("title") or await slot.get_attribute("aria-label")
+        lc = await slot.get_attribute("lc")
+        if title and "Available" in title and lc:
+            try:
+                hora_inicio, hora_fin = title.split(" - ")[0].split("–")
+                court_number = lc.split("|")[0].strip()
+
+                rows.append(BloqueLibre(
+                    "Pittwater RSL", f"Court {court_number}", current_date, hora_inicio.strip(), hora_fin.strip()
+                ))
+            except:
+                continue
+    return date_text, dia.strftime("%Y%m%d"), rows
+
+async def avanzar_dia_pittwater(page, date_text):
+    # En vez de dormir 3s: esperar a que cambie el encabezado del día y a que
+    # termine el request que trae la grilla nueva
+    next_button = await page.query_selector("#nextDateMover")
+    if not next_button:
+        return False
+    # Cada click pide la grilla del día siguiente al sitio: pasa por el limitador
+    lim = limitador.para(PITTWATER_URL, PITTWATER_RPS)
+    await lim.esperar_async()
+    with FETCH_SEGUNDOS.labels("pittwater", host(PITTWATER_URL)).time():
+        await next_button.click()
+        try:
+            await page.wait_for_function(
+                "prev => { const h = document.querySelector('h3'); return h && h.innerText !== prev; }",
+                arg=date_text,
+                timeout=PITTWATER_TIMEOUT_MS
+            )
+        except Exception as e:
+            lim.registrar(error=e)
+            raise
+        lim.registrar(200)
+        try:
+            await page.wait_for_load_state("networkidle", timeout=PITTWATER_TIMEOUT_MS)
+        except Exception:
+            pass
+    return True
+
+async def scrape_pittwater_multiple_days(days_to_scrap=28, desde=0):
+    """Scrapea `days_to_scrap` días empezando `desde` días después de hoy, en
+    una sola página. Devuelve (bloques, fechas %Y%m%d efectivamente leídas)."""
+    # YepBooking no expone la fecha en la URL: a cualquier día se llega
+    # clickeando desde hoy, así que partir el rango en varias páginas no
+    # acorta el recorrido (la última ventana hace los mismos clicks que la
+    # corrida serie) y multiplica los requests contra el mismo limitador.
+    # Se recorre una vez; cada click espera la grilla, no un timeout fijo.
+    data = []
+    fechas = []
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page()
-        await page.goto("https://pittwater-rsl-futsal.yepbooking.com.au/", timeout=60000)
-
-        all_data = []
-        for day_index in range(days_to_scrap):
-            #await page.wait_for_selector("a.empty", timeout=10000)
-            #await page.wait_for_selector("h3")
-            date_header = await page.query_selector("h3")
-            date_text = await date_header.inner_text()
-            current_date = parser.parse(date_text).strftime("%d-%m-%Y")
-
-            slots = await page.query_selector_all("a.empty")
-
-            for slot in slots:
-                title = await slot.get_attribute("title") or await slot.get_attribute("aria-label")
-                lc = await slot.get_attribute("lc")
-                if title and "Available" in title and lc:
-                    try:
-                        hora_inicio, hora_fin = title.split(" - ")[0].split("–")
-                        court_number = lc.split("|")[0].strip()
-
-                        all_data.append({
-                            "venue": "Pittwater RSL",
-                            "fecha": current_date,
-                            "hora_inicio": hora_inicio.strip(),
-                            "hora_fin": hora_fin.strip(),
-                            "court": f"Court {court_number}"
-                        })
-                    except:
-                        continue
-
-            # Click to next day if not the last day
-            if day_index < days_to_scrap - 1:
-                next_button = await page.query_selector("#nextDateMover")
-                if next_button:
-                    await next_button.click()
-                    await page.wait_for_timeout(3000)
-
-        await browser.close()
-        return pd.DataFrame(all_data)
-
-
-# Función para expandir bloques
-
-def expand_consecutive_blocks(df):
-    expanded_rows = []
-    for (venue, court, fecha), group in df.groupby(["venue", "court", "fecha"]):
-        slots = []
-        for _, row in group.iterrows():
-            start_str = f"{row['fecha']} {row['hora_inicio']}"
-            end_str = f"{row['fecha']} {row['hora_fin']}"
-            start_dt = datetime.strptime(start_str, "%d-%m-%Y %I:%M%p")
-            end_dt = datetime.strptime(end_str, "%d-%m-%Y %I:%M%p")
-            slots.append((start_dt, end_dt))
-
-        slots.sort()
-        available = set()
-        for start, end in slots:
-            t = start
-            while t + timedelta(minutes=30) <= end:
-                available.add(t)
-                t += timedelta(minutes=30)
-        available = sorted(available)
-
-        for i in range(len(available)):
-            t0 = available[i]
-            for duration in [30, 60, 90, 120]:
-                end_t = t0 + timedelta(minutes=duration)
-                if all(t0 + timedelta(minutes=30 * k) in available for k in range(duration // 30)):
-                    expanded_rows.append({
-                        "venue": venue,
-                        "fecha": t0.strftime("%Y%m%d"),
-                        "hora": t0.strftime("%I:%M %p"),
-                        "minutos": duration,
-                        "court": court,
-                        "link": "https://pittwater-rsl-futsal.yepbooking.com.au/"
-                    })
-    return pd.DataFrame(expanded_rows)
+        try:
+            lim = limitador.para(PITTWATER_URL, PITTWATER_RPS)
+            await lim.esperar_async()
+            with FETCH_SEGUNDOS.labels("pittwater", host(PITTWATER_URL)).time():
+                try:
+                    response = await page.goto(PITTWATER_URL, timeout=60000)
+                except Exception as e:
+                    lim.registrar(error=e)
+                    raise
+                lim.registrar(response.status if response else 200)
+            for _ in range(desde):
+                date_text = await (await page.query_selector("h3")).inner_text()
+                if not await avanzar_dia_pittwater(page, date_text):
+                    return data, fechas
+            for day_index in range(days_to_scrap):
+                with PARSE_SEGUNDOS.labels("pittwater").time():
+                    date_text, fecha, rows = await leer_dia_pittwater(page)
+                FILAS.labels("pittwater", "Pittwater RSL").inc(len(rows))
+                data.extend(rows)
+                # Sólo las fechas que se leyeron entran al alcance: un día que
+                # no se alcanzó a ver no es un día vacío
+                fechas.append(fecha)
+                if day_index < days_to_scrap - 1:
+                    if not await avanzar_dia_pittwater(page, date_text):
+                        break
+        except Exception:
+            FALLAS.labels("pittwater", "Pittwater RSL").inc()
+            raise
+        finally:
+            await browser.close()
+    return data, fechas
+
 
 # ──────────────────────────────────────────────────────────────
 # MAIN
 # ──────────────────────────────────────────────────────────────
+def filtrar_cambios(registros, huellas, venue, fechas, variante=""):
+    """Deja sólo los registros de las fechas de `venue` cuya huella cambió."""
+    por_fecha = {fecha: [] for fecha in fechas}
+    for registro in registros:
+        if registro.fecha in por_fecha:
+            por_fecha[registro.fecha].append(registro)
+    return [
+        registro
+        for fecha, de_la_fecha in por_fecha.items()
+        if huellas.cambio(venue, fecha, variante, de_la_fecha)
+        for registro in de_la_fecha
+    ]
+
+def preparar_tablas():
+    crear_tabla_futsal()
+    crear_tabla_intervalos()
+    return Huellas("futsal_horarios"), Huellas("futsal_intervalos")
+
+def guardar_y_publicar(slots_kikoff, fallidas, intervalos, fechas, fechas_pittwater, huellas_kikoff, huellas_pittwater):
+    # Sólo se guardan las fechas que cambiaron desde la última corrida
+    slots_kikoff = filtrar_cambios(
+        slots_kikoff, huellas_kikoff, "KIKOFF", [f for f in fechas if f not in fallidas],
+        variante=",".join(str(d) for d in KIKOFF_DURATION_IDS)
+    )
+    # Pittwater con las fechas que mostró el sitio (Sydney), no las del contenedor
+    intervalos = filtrar_cambios(intervalos, huellas_pittwater, "Pittwater RSL", fechas_pittwater)
+    guardar_futsal(slots_kikoff)
+    guardar_intervalos(intervalos, PITTWATER_URL)
+    print(f"Guardados {len(slots_kikoff)} slots de KIKOFF y {len(intervalos)} intervalos de Pittwater.")
+    # Pittwater sigue en el alcance de futsal_horarios para limpiar las filas
+    # expandidas que quedaron de antes de pasar a intervalos
+    publicar_tabla(
+        "futsal_horarios",
+        claves=["venue", "fecha", "hora", "court", "minutos"],
+        valores=["link", "hora_bucket"],
+        alcance=huellas_kikoff.alcance() | {("Pittwater RSL", fecha) for fecha in fechas_pittwater},
+        indices=[("fecha", "venue", "hora_bucket"), ("fecha", "hora")],
+        huellas=huellas_kikoff
+    )
+    publicar_tabla(
+        "futsal_intervalos",
+        claves=["venue", "court", "fecha", "rango"],
+        valores=["link"],
+        alcance=huellas_pittwater.alcance(),
+        indices=[("fecha", "venue")],
+        indices_gist=[("rango",)],
+        huellas=huellas_pittwater
+    )
+    return slots_kikoff, intervalos
+
+async def scrapear(desde=0, dias=DAYS_TO_SCRAPE):
+    """Scrapea y publica los días [hoy + desde, hoy + desde + dias)."""
+    # Lo que toca la base bloquea: va en threads para no frenar el event
+    # loop (en el scheduler lo comparte con tennis)
+    huellas_kikoff, huellas_pittwater = await asyncio.to_thread(preparar_tablas)
+    # KIKOFF (HTTP, en un thread) corre mientras Playwright recorre Pittwater
+    (slots_kikoff, fallidas), (bloques, fechas_pittwater) = await asyncio.gather(
+        asyncio.to_thread(scrape_kikoff, KIKOFF_MAX_DAYS, desde, dias),
+        scrape_pittwater_multiple_days(days_to_scrap=dias, desde=desde)
+    )
+    intervalos = unir_bloques(bloques)
+    fechas = [dia.strftime("%Y%m%d") for dia in dias_horizonte(desde, dias)]
+    return await asyncio.to_thread(
+        guardar_y_publicar, slots_kikoff, fallidas, intervalos, fechas, fechas_pittwater,
+        huellas_kikoff, huellas_pittwater
+    )
+
 async def main():
     start = time.time()
-    crear_tabla_futsal()
-    df_kikoff = scrape_kikoff()
-    df_raw = await scrape_pittwater_multiple_days(days_to_scrap=DAYS_TO_SCRAPE)
-    df_pittwater = expand_consecutive_blocks(df_raw)
-    # Unificá outputs y columnas
-    df = pd.concat([df_kikoff, df_pittwater], ignore_index=True)
-    guardar_futsal_df(df)
-    print(f"Guardados {len(df)} registros de futsal.")
+    slots_kikoff, intervalos = await scrapear()
     end = time.time()
     print(f"\nTiempo total: {end - start:.2f} segundos")
-    return df
+    return slots_kikoff, intervalos
 
 # Para ejecutar manualmente (agregá esto en tu cron, script, etc):
 if __name__ == "__main__":
@@ -1,16 +1,29 @@
 import os
 import time
-import datetime
+import requests
 import nest_asyncio
 import asyncio
+from contextlib import asynccontextmanager
 from playwright.async_api import async_playwright
-import pandas as pd
+from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs
-import psycopg2
-from psycopg2.extras import execute_values
+from db_utils import crear_tabla_staging, publicar_tabla, staging, Huellas, ESCRITOR, ESCRITOR_LOTE
+from normalizacion import filas_tipadas, dias_horizonte
+from registros import SlotTennis, sin_duplicados, en_lotes
+from metricas import FETCH_SEGUNDOS, PARSE_SEGUNDOS, FILAS, FALLAS, host
+import limitador
 
 nest_asyncio.apply()
 
+# Configurable para apuntar a un stub local (bench/bench_offline.py)
+BASE_URL = os.getenv("TENNIS_BASE_URL", "https://www.tennisvenues.com.au")
+# Tasa inicial del limitador del host (req/s); se adapta según las respuestas
+TENNIS_RPS = float(os.getenv("TENNIS_RPS", "0.5"))
+HTTP_HEADERS = {"User-Agent": "Mozilla/5.0"}
+# "http": requests + BeautifulSoup, con Playwright como fallback automático
+# "browser": siempre Playwright
+FETCH_MODE = os.getenv("TENNIS_FETCH_MODE", "http")
+
 VENUES = [
     "oxford-fall-racquet-club",
     "allambie-heights-tennis",
@@ -24,122 +37,238 @@ VENUES = [
     
 ]
 
-# 1. Conexión a Postgres
-def get_conn():
-    # Tomá el string de conexión de la variable de entorno o editá acá
-    DATABASE_URL = os.getenv("DATABASE_URL")
-    return psycopg2.connect(DATABASE_URL)
-
-# 2. Crear tabla si no existe
+# 2. Tabla de staging (se publica al terminar la corrida)
 def crear_tabla_postgres():
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("DROP TABLE IF EXISTS horarios;")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS horarios (
-            id SERIAL PRIMARY KEY,
-            venue TEXT,
-            fecha TEXT,
-            cancha TEXT,
-            hora TEXT,
-            link TEXT,
-            UNIQUE(venue, fecha, cancha, hora)
-        )
+    crear_tabla_staging("horarios", """
+        id SERIAL PRIMARY KEY,
+        venue TEXT,
+        fecha DATE,
+        cancha TEXT,
+        hora TIME,
+        link TEXT,
+        hora_bucket TIME,
+        UNIQUE(venue, fecha, cancha, hora)
     """)
-    conn.commit()
-    cur.close()
-    conn.close()
-
-# 3. Scraper
-async def extraer_disponibilidad(venue, fecha="20250528"):
-    url = f"https://www.tennisvenues.com.au/booking/{venue}?date={fecha}"
-    base = "https://www.tennisvenues.com.au"
+
+# 3. Pool de navegadores
+# Un solo Chromium por corrida; cada tarea toma un contexto prestado y lo
+# devuelve. Los contextos se reciclan cada `max_usos` páginas para que no
+# acumulen memoria, y si el browser se cae se relanza. Todo se crea recién
+# en el primer uso: en modo http el browser sólo arranca si hace falta el
+# fallback.
+class BrowserPool:
+    def __init__(self, playwright, size=2, max_usos=25):
+        self.playwright = playwright
+        self.size = size
+        self.max_usos = max_usos
+        self.browser = None
+        self._libres = asyncio.Queue()
+        for _ in range(size):
+            self._libres.put_nowait((None, 0))
+        self._lock = asyncio.Lock()
+
+    async def _nuevo_contexto(self):
+        async with self._lock:
+            if self.browser is None or not self.browser.is_connected():
+                self.browser = await self.playwright.chromium.launch(headless=True)
+        return await self.browser.new_context()
+
+    @asynccontextmanager
+    async def page(self):
+        context, usos = await self._libres.get()
+        page = None
+        try:
+            if context is None or not self.browser.is_connected():
+                context = await self._nuevo_contexto()
+                usos = 0
+            page = await context.new_page()
+            yield page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            usos += 1
+            if context is not None and (usos >= self.max_usos or not self.browser.is_connected()):
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+                context, usos = None, 0
+            self._libres.put_nowait((context, usos))
+
+    async def close(self):
+        while not self._libres.empty():
+            context, _ = self._libres.get_nowait()
+            if context is None:
+                continue
+            try:
+                await context.close()
+            except Exception:
+                pass
+        if self.browser is not None:
+            await self.browser.close()
+
+# 4. Scraper
+def parsear_disponibilidad_html(html, venue, fecha):
+    """SlotTennis disponibles de una página de booking, o None si la página no
+    trae la grilla (markup cambiado o render por JS: ir a Playwright)."""
+    soup = BeautifulSoup(html, "html.parser")
+    if not soup.select("td.TimeCell"):
+        return None
     resultados = []
+    for a in soup.select("td.TimeCell.Available a"):
+        href = a.get("href")
+        if not href:
+            continue
+        cancha = parse_qs(urlparse(href).query).get("id", ["Desconocida"])[0]
+        resultados.append(SlotTennis(venue, fecha, cancha, a.get_text(strip=True), f"{BASE_URL}{href}"))
+    return list(sin_duplicados(resultados))
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+async def extraer_disponibilidad_http(venue, fecha, session):
+    url = f"{BASE_URL}/booking/{venue}?date={fecha}"
+    try:
+        response = await asyncio.to_thread(limitador.get, session, url, TENNIS_RPS, "tennis", timeout=15)
+    except Exception as e:
+        print(f"⚠️  HTTP falló en {venue}-{fecha}, uso Playwright: {e}")
+        return None
+    with PARSE_SEGUNDOS.labels("tennis").time():
+        resultados = parsear_disponibilidad_html(response.text, venue, fecha)
+    if resultados is None:
+        print(f"⚠️  Sin grilla en el HTML de {venue}-{fecha}, uso Playwright")
+    return resultados
+
+async def extraer_disponibilidad(venue, fecha="20250528", pool=None, session=None):
+    if session is not None:
+        slots = await extraer_disponibilidad_http(venue, fecha, session)
+        if slots is not None:
+            return slots
+
+    if pool is None:
+        # Uso suelto (fuera de scrapear_concurrente): pool de un solo contexto
+        async with async_playwright() as p:
+            pool = BrowserPool(p, size=1)
+            try:
+                return await extraer_disponibilidad(venue, fecha, pool)
+            finally:
+                await pool.close()
+
+    url = f"{BASE_URL}/booking/{venue}?date={fecha}"
+    resultados = []
+
+    lim = limitador.para(url, TENNIS_RPS)
+    async with pool.page() as page:
+        response = None
         try:
-            await page.goto(url)
-            await page.wait_for_selector("td.TimeCell.Available a", timeout=8000)
+            await lim.esperar_async()
+            with FETCH_SEGUNDOS.labels("tennis_browser", host(BASE_URL)).time():
+                response = await page.goto(url)
+                lim.registrar(response.status if response else 200)
+                # Se espera la grilla, no un slot libre: un día sin lugares es
+                # una página válida, no un error
+                await page.wait_for_selector("td.TimeCell", timeout=8000)
         except Exception as e:
+            if response is None:
+                lim.registrar(error=e)
             print(f"❌ Error en {venue}-{fecha}: {e}")
-            await browser.close()
-            return pd.DataFrame()  # Vacío
+            return None  # No se pudo leer: queda fuera del alcance
 
+        t_parse = time.perf_counter()
         enlaces = await page.query_selector_all("td.TimeCell.Available a")
         for a in enlaces:
             hora = await a.inner_text()
             href = await a.get_attribute("href")
             if not href:
                 continue
-            full_url = f"{base}{href}"
+            full_url = f"{BASE_URL}{href}"
             cancha = parse_qs(urlparse(href).query).get("id", ["Desconocida"])[0]
+            resultados.append(SlotTennis(venue, fecha, cancha, hora, full_url))
+        PARSE_SEGUNDOS.labels("tennis_browser").observe(time.perf_counter() - t_parse)
+
+    return list(sin_duplicados(resultados))
+
+# 5. Guardado en Postgres (Bulk)
+COLUMNAS = SlotTennis._fields + ('hora_bucket',)
+
+def _lotes(slots):
+    for lote in en_lotes(slots, ESCRITOR_LOTE):
+        yield filas_tipadas(lote, idx_fecha=1, idx_hora=3)
 
-            resultados.append({
-                "venue": venue,
-                "fecha": fecha,
-                "cancha": cancha,
-                "hora": hora,
-                "link": full_url
-            })
-
-        await browser.close()
-
-    df = pd.DataFrame(resultados).drop_duplicates()
-    return df
-
-# 4. Guardado en Postgres (Bulk)
-def guardar_df_postgres(df):
-    if df.empty:
-        return
-    conn = get_conn()
-    with conn:
-        with conn.cursor() as cur:
-            # Borrar todos los registros de ese venue/fecha
-            venues = df['venue'].unique()
-            fechas = df['fecha'].unique()
-            for venue in venues:
-                for fecha in fechas:
-                    cur.execute("DELETE FROM horarios WHERE venue=%s AND fecha=%s", (venue, fecha))
-            # Insertar todo el dataframe de una vez
-            rows = list(df[['venue', 'fecha', 'cancha', 'hora', 'link']].itertuples(index=False, name=None))
-            execute_values(
-                cur,
-                "INSERT INTO horarios (venue, fecha, cancha, hora, link) VALUES %s ON CONFLICT DO NOTHING",
-                rows
-            )
-    conn.close()
-
-# 5. Scraping concurrente
-async def scrapear_concurrente(venues, fechas, max_concurrent=4):
+def guardar_slots_postgres(slots):
+    # Encola para el escritor de fondo, en lotes acotados
+    for rows in _lotes(slots):
+        ESCRITOR.escribir(staging("horarios"), COLUMNAS, rows)
+
+async def guardar_slots_async(slots):
+    # Igual, desde el event loop: con la cola llena no lo bloquea
+    for rows in _lotes(slots):
+        await ESCRITOR.escribir_async(staging("horarios"), COLUMNAS, rows)
+
+# 6. Scraping concurrente
+async def scrapear_concurrente(venues, fechas, max_concurrent=4, max_usos=25, fetch_mode=FETCH_MODE):
     from asyncio import Semaphore, create_task, gather
 
-    crear_tabla_postgres()
+    # Lo que toca la base bloquea: en un thread, fuera del event loop
+    await asyncio.to_thread(crear_tabla_postgres)
+    huellas = await asyncio.to_thread(Huellas, "horarios")
     sem = Semaphore(max_concurrent)
+    session = None
+    if fetch_mode == "http":
+        session = requests.Session()
+        session.headers.update(HTTP_HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_concurrent)
+        session.mount("https://", adapter)
 
     async def scrapear_venue_fecha(venue, fecha):
         async with sem:
             t0 = time.time()
             print(f"[INICIO] {venue} - {fecha} - {t0:.2f}")
-            df = await extraer_disponibilidad(venue, fecha)
-            guardar_df_postgres(df)
+            slots = await extraer_disponibilidad(venue, fecha, pool, session)
+            # None = página que no se pudo leer: queda fuera del alcance
+            # y se conservan sus filas publicadas, igual que las que no cambiaron
+            if slots is None:
+                FALLAS.labels("tennis", venue).inc()
+            else:
+                FILAS.labels("tennis", venue).inc(len(slots))
+                if huellas.cambio(venue, fecha, "", slots):
+                    await guardar_slots_async(slots)
+                else:
+                    print(f"[IGUAL]  {venue} - {fecha}")
             t1 = time.time()
             print(f"[FIN]    {venue} - {fecha} - {t1:.2f} (Duración: {t1-t0:.2f}s)")
-            await asyncio.sleep(4)   # <-- Espaciá requests para evitar baneos
 
-    tareas = [
-        create_task(scrapear_venue_fecha(venue, fecha))
-        for venue in venues
-        for fecha in fechas
-    ]
-    await gather(*tareas)
+    async with async_playwright() as p:
+        pool = BrowserPool(p, size=max_concurrent, max_usos=max_usos)
+        try:
+            tareas = [
+                create_task(scrapear_venue_fecha(venue, fecha))
+                for venue in venues
+                for fecha in fechas
+            ]
+            await gather(*tareas)
+        finally:
+            await pool.close()
+            if session is not None:
+                session.close()
+    await asyncio.to_thread(
+        publicar_tabla,
+        "horarios",
+        claves=["venue", "fecha", "cancha", "hora"],
+        valores=["link", "hora_bucket"],
+        alcance=huellas.alcance(),
+        indices=[("fecha", "venue", "hora_bucket"), ("fecha", "hora")],
+        huellas=huellas
+    )
+
+# 7. Rango de días (lo usa también scheduler.py)
+async def scrapear(desde=0, dias=28, max_concurrent=2):
+    fechas = [dia.strftime("%Y%m%d") for dia in dias_horizonte(desde, dias)]
+    await scrapear_concurrente(VENUES, fechas, max_concurrent=max_concurrent)
 
-# 6. Main
+# 8. Main
 if __name__ == "__main__":
-    hoy = datetime.date.today()
-    fechas = [(hoy + datetime.timedelta(days=i)).strftime("%Y%m%d") for i in range(28)] # 7 días
     start = time.time()
-    asyncio.run(scrapear_concurrente(VENUES, fechas, max_concurrent=2))
+    asyncio.run(scrapear(0, 28, max_concurrent=2))
     end = time.time()
     print(f"\nTiempo total: {end - start:.2f} segundos")